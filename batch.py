@@ -0,0 +1,60 @@
+"""
+Input handling for batch jobs: read URL lists and drop duplicate videos.
+"""
+import csv
+import logging
+import os
+
+from url_utils import normalize_video_url
+
+logger = logging.getLogger(__name__)
+
+URL_COLUMNS = ("url", "link", "video", "video_url", "youtube_url")
+
+
+def _looks_like_url(value):
+    value = value.strip().lower()
+    return value.startswith(("http://", "https://", "www.", "youtu.be/", "youtube.com/", "m.youtube.com/"))
+
+
+def _read_csv(f):
+    rows = csv.reader(f)
+    header = next(rows, None)
+    if header is None:
+        return
+    lowered = [cell.strip().lower() for cell in header]
+    column = next((lowered.index(name) for name in URL_COLUMNS if name in lowered), None)
+    if column is None:
+        # No header row: take the first URL-looking cell of every row, header included
+        for row in [header, *rows]:
+            cell = next((c for c in row if _looks_like_url(c)), None)
+            if cell:
+                yield cell.strip()
+        return
+    for row in rows:
+        if column < len(row) and row[column].strip():
+            yield row[column].strip()
+
+
+def read_url_file(path):
+    """Yield URLs from a text file (one per line, ``#`` comments allowed) or a CSV file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            yield from _read_csv(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def dedupe_urls(urls):
+    """Normalize every URL to its video and keep the first occurrence, in input order."""
+    seen = set()
+    unique = []
+    for url in urls:
+        normalized = normalize_video_url(url)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(normalized)
+    return unique
@@ -0,0 +1,295 @@
+"""
+Offline throughput benchmark for downloader.download_and_convert / download_playlist.
+
+Media is generated with ffmpeg's lavfi sources (sine tones, test patterns)
+and served from a local HTTP server. A stand-in yt-dlp extractor turns
+``http://127.0.0.1:<port>/bench/...`` URLs into info dicts, so no request
+leaves the machine. Each scenario runs in its own subprocess so peak RSS
+is per scenario.
+
+Usage (ffmpeg on PATH):
+    python benchmarks/bench_downloader.py --output bench.json
+    python benchmarks/bench_downloader.py --durations 10,60 --playlist-items 8 --output new.json --compare bench.json
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_DURATIONS = "10,60"
+DEFAULT_PLAYLIST_ITEMS = 6
+# The stand-in playlist is listed in pages like YouTube's, each costing a round-trip
+PLAYLIST_PAGE_SIZE = 2
+PLAYLIST_PAGE_DELAY_S = 0.25
+
+
+def generate_media(media_dir, durations):
+    """Write an opus/webm tone and an H.264/AAC test pattern per duration; returns {name: path}."""
+    media = {}
+    for seconds in durations:
+        audio = media_dir / f"tone-{seconds}s.webm"
+        video = media_dir / f"pattern-{seconds}s.mp4"
+        if not audio.exists():
+            subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                 "-c:a", "libopus", "-b:a", "128k", str(audio)],
+                check=True,
+            )
+        if not video.exists():
+            subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-y",
+                 "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=30:duration={seconds}",
+                 "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                 "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", str(video)],
+                check=True,
+            )
+        media[audio.stem] = audio
+        media[video.stem] = video
+    return media
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def install_stand_in_extractor(media_dir):
+    """Make every yt_dlp.YoutubeDL resolve /bench/ URLs from ``media_dir`` before the real extractors."""
+    import yt_dlp
+    from yt_dlp.extractor.common import InfoExtractor
+
+    class LocalBenchIE(InfoExtractor):
+        IE_NAME = "localbench"
+        _VALID_URL = r"https?://127\.0\.0\.1:(?P<port>\d+)/bench/video/(?P<id>[^/?#]+)(?:\?i=(?P<index>\d+))?"
+
+        def _real_extract(self, url):
+            mobj = self._match_valid_url(url)
+            name, port, index = mobj.group("id"), mobj.group("port"), mobj.group("index") or "0"
+            path = next(media_dir.glob(f"{name}.*"))
+            is_video = path.suffix == ".mp4"
+            return {
+                "id": f"{name}-{index}",
+                "title": f"{name} {index}",
+                "formats": [{
+                    "format_id": "av" if is_video else "audio",
+                    "url": f"http://127.0.0.1:{port}/{path.name}",
+                    "ext": path.suffix.lstrip("."),
+                    "vcodec": "avc1.64001f" if is_video else "none",
+                    "acodec": "mp4a.40.2" if is_video else "opus",
+                    "filesize": path.stat().st_size,
+                }],
+            }
+
+    class LocalBenchPlaylistIE(InfoExtractor):
+        IE_NAME = "localbench:playlist"
+        _VALID_URL = r"https?://127\.0\.0\.1:(?P<port>\d+)/bench/playlist/(?P<count>\d+)/(?P<id>[^/?#]+)"
+
+        def _real_extract(self, url):
+            mobj = self._match_valid_url(url)
+            name, port, count = mobj.group("id"), mobj.group("port"), int(mobj.group("count"))
+
+            def entries():
+                for i in range(count):
+                    if i % PLAYLIST_PAGE_SIZE == 0:
+                        time.sleep(PLAYLIST_PAGE_DELAY_S)
+                    yield self.url_result(f"http://127.0.0.1:{port}/bench/video/{name}?i={i}", LocalBenchIE, f"{name}-{i}")
+
+            return self.playlist_result(entries(), f"{name}-x{count}", f"bench {name} x{count}")
+
+    class BenchYoutubeDL(yt_dlp.YoutubeDL):
+        def add_default_info_extractors(self):
+            self.add_info_extractor(LocalBenchPlaylistIE())
+            self.add_info_extractor(LocalBenchIE())
+            super().add_default_info_extractors()
+
+    yt_dlp.YoutubeDL = BenchYoutubeDL
+
+
+def _timed(stats, key, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with stats["lock"]:
+                stats[key] = stats.get(key, 0.0) + elapsed
+    return wrapper
+
+
+def _dir_bytes(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file() and not p.name.startswith("."))
+
+
+def run_scenario(kind, name, media_dir, items, workers):
+    """Run one scenario in this process and return its measurements."""
+    import logging
+    logging.disable(logging.CRITICAL)
+    install_stand_in_extractor(media_dir)
+
+    import downloader
+    import info_cache
+    from rate_limiter import limiter
+
+    # Request pacing protects real sites; the local server needs none
+    limiter.configure(initial_rate=1e6, max_rate=1e6, burst=1e6)
+
+    server = serve(media_dir)
+    port = server.server_address[1]
+    work_dir = Path(tempfile.mkdtemp(prefix="smuggy-bench-"))
+    # Cold caches every run
+    info_cache.info_cache.path = work_dir / "info_cache.sqlite3"
+
+    stats = {"lock": threading.Lock()}
+    downloader.extract_info_cached = _timed(stats, "extract_s", downloader.extract_info_cached)
+    downloader.fetch_source = _timed(stats, "fetch_s", downloader.fetch_source)
+    downloader.transcode_source = _timed(stats, "transcode_s", downloader.transcode_source)
+
+    fmt = "mp4" if name.startswith("pattern") else "mp3"
+    source_bytes = next(media_dir.glob(f"{name}.*")).stat().st_size * items
+    out_dir = work_dir / "out"
+    out_dir.mkdir()
+    first_item = []
+    started = time.perf_counter()
+    if kind == "single":
+        results = [{"status": "success", "file_id": downloader.download_and_convert(f"http://127.0.0.1:{port}/bench/video/{name}", fmt, None, target_dir=str(out_dir))}]
+    else:
+        results = downloader.download_playlist(
+            f"http://127.0.0.1:{port}/bench/playlist/{items}/{name}", fmt, None, target_dir=str(out_dir), max_workers=workers,
+            on_item=lambda idx, result: first_item.append(time.perf_counter()),
+        ) or []
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    ok = sum(1 for r in results if r.get("status") == "success")
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KiB on Linux
+    return {
+        "scenario": f"{kind}:{name}" + (f":x{items}:w{workers}" if kind == "playlist" else ""),
+        "fmt": fmt,
+        "items": items,
+        "succeeded": ok,
+        "wall_s": round(wall, 3),
+        "first_item_s": round((first_item[0] if first_item else started + wall) - started, 3),
+        "items_per_s": round(ok / wall, 3) if wall else None,
+        "source_mb_per_s": round(source_bytes / wall / 1e6, 3) if wall else None,
+        "output_mb": round(_dir_bytes(out_dir) / 1e6, 3),
+        "stage_s": {
+            "extract": round(stats.get("extract_s", 0.0), 3),
+            "download": round(stats.get("fetch_s", 0.0) - stats.get("extract_s", 0.0), 3),
+            "transcode": round(stats.get("transcode_s", 0.0), 3),
+        },
+        "peak_rss_mb": round(self_usage.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(child_usage.ru_maxrss / 1024, 1),
+        "cpu_s": round(self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime, 3),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ffmpeg_version():
+    try:
+        first = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, check=True).stdout.splitlines()[0]
+        return re.sub(r"\s+Copyright.*", "", first)
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return None
+
+
+def compare(current, baseline):
+    before = {s["scenario"]: s for s in baseline["scenarios"]}
+    print(f"\n{'scenario':42} {'items/s':>10} {'before':>10} {'change':>8}")
+    for scenario in current["scenarios"]:
+        old = before.get(scenario["scenario"])
+        if not old or not old.get("items_per_s") or not scenario.get("items_per_s"):
+            continue
+        change = (scenario["items_per_s"] / old["items_per_s"] - 1) * 100
+        print(f"{scenario['scenario']:42} {scenario['items_per_s']:>10.3f} {old['items_per_s']:>10.3f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", default=DEFAULT_DURATIONS, help="comma-separated source lengths in seconds")
+    parser.add_argument("--playlist-items", type=int, default=DEFAULT_PLAYLIST_ITEMS)
+    parser.add_argument("--workers", default="1,4", help="comma-separated playlist worker counts")
+    parser.add_argument("--media-dir", help="reuse generated media between runs")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    media_dir = Path(args.media_dir or tempfile.mkdtemp(prefix="smuggy-bench-media-"))
+    media_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.scenario:
+        kind, name, items, workers = args.scenario.split(":")
+        print(json.dumps(run_scenario(kind, name, media_dir, int(items), int(workers))))
+        return
+
+    durations = [int(d) for d in args.durations.split(",") if d]
+    media = generate_media(media_dir, durations)
+    plan = []
+    for name in sorted(media):
+        plan.append(("single", name, 1, 1))
+    for name in sorted(media):
+        for workers in (int(w) for w in args.workers.split(",") if w):
+            plan.append(("playlist", name, args.playlist_items, workers))
+
+    scenarios = []
+    for kind, name, items, workers in plan:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--media-dir", str(media_dir), "--scenario", f"{kind}:{name}:{items}:{workers}"],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{kind}:{name} failed:\n{proc.stderr}", file=sys.stderr)
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        scenarios.append(result)
+        print(f"{result['scenario']:42} {result['items_per_s']:>8} items/s {result['source_mb_per_s']:>8} MB/s "
+              f"first {result['first_item_s']}s "
+              f"rss {result['peak_rss_mb']} MB  stages {result['stage_s']}")
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": _ffmpeg_version(),
+        "scenarios": scenarios,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Several renditions of one video: a download_and_convert per rendition vs one download_and_convert_targets.
+
+The media is served from a local server through a stand-in extractor, as in
+bench_downloader. Each mode starts from an empty output folder. Reported
+per mode: wall time, CPU time of the ffmpeg children (decode + encode), and
+connections the server saw (one per download).
+
+Usage (ffmpeg on PATH):
+    python benchmarks/bench_multi_output.py --seconds 60 --targets mp3:320,mp3:256,mp3:192,mp4
+"""
+import argparse
+import json
+import logging
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_downloader import generate_media, install_stand_in_extractor  # noqa: E402
+from bench_sessions import serve  # noqa: E402
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(mode, url, targets, work):
+    import downloader
+
+    out = work / mode
+    started, cpu_started = time.perf_counter(), _children_cpu()
+    if mode == "separate":
+        # Distinct folders so same-format renditions don't overwrite each other
+        filenames = [
+            downloader.download_and_convert(url, fmt, quality, target_dir=str(out / f"{fmt}-{quality}"), connections=1)
+            for fmt, quality in targets
+        ]
+    else:
+        filenames = downloader.download_and_convert_targets(url, targets, target_dir=str(out), connections=1)
+    return {
+        "mode": mode,
+        "wall_s": round(time.perf_counter() - started, 3),
+        "ffmpeg_cpu_s": round(_children_cpu() - cpu_started, 3),
+        "filenames": filenames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="length of the test video")
+    parser.add_argument("--targets", default="mp3:320,mp3:256,mp3:192,mp4")
+    args = parser.parse_args()
+
+    from cli import parse_target
+
+    targets = [parse_target(text) for text in args.targets.split(",")]
+    logging.disable(logging.CRITICAL)
+    media_dir = Path(tempfile.mkdtemp(prefix="smuggy-multi-media-"))
+    generate_media(media_dir, [args.seconds])
+    install_stand_in_extractor(media_dir)
+    import info_cache
+    from rate_limiter import limiter
+
+    limiter.configure(initial_rate=1e6, max_rate=1e6, burst=1e6)
+    work = Path(tempfile.mkdtemp(prefix="smuggy-multi-"))
+    info_cache.info_cache.path = work / "info_cache.sqlite3"
+    server = serve(media_dir, 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/bench/video/pattern-{args.seconds}s"
+    report = {"seconds": args.seconds, "targets": args.targets, "runs": []}
+    for mode in ("separate", "multi-output"):
+        before = server.connections
+        result = run(mode, url, targets, work)
+        result["connections"] = server.connections - before
+        report["runs"].append(result)
+    separate, multi = report["runs"]
+    report["ffmpeg_cpu_saved_percent"] = round(100 * (1 - multi["ffmpeg_cpu_s"] / separate["ffmpeg_cpu_s"]), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
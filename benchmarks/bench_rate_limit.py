@@ -0,0 +1,161 @@
+"""
+Rate limiter against a local server that answers 429 above a fixed request rate.
+
+The server accepts --server-rate requests/s (token bucket) and answers 429
+with a Retry-After header above that. The same workload runs twice, without
+and with rate_limiter.RateLimiter: requests sent, 429s received, successful
+requests/s, and the rate the limiter settled on. A last check sends a
+yt-dlp extraction through downloader.extract_info_cached to a path that
+always answers 429, to confirm yt-dlp's error gets recognised as throttling.
+
+Usage:
+    python benchmarks/bench_rate_limit.py --server-rate 5 --workers 8 --requests 200
+"""
+import argparse
+import http.server
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rate_limiter import RateLimiter, host_key, throttle_info  # noqa: E402
+
+
+class ThrottlingServer(http.server.ThreadingHTTPServer):
+    def __init__(self, rate, retry_after):
+        super().__init__(("127.0.0.1", 0), ThrottlingHandler)
+        self.rate = rate
+        self.retry_after = retry_after
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {"ok": 0, "429": 0}
+
+    def admit(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            admitted = self.tokens >= 1
+            if admitted:
+                self.tokens -= 1
+            self.counts["ok" if admitted else "429"] += 1
+            return admitted
+
+
+class ThrottlingHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/always429") or not self.server.admit():
+            self.send_response(429)
+            self.send_header("Retry-After", str(self.server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read()
+
+
+def run_workload(url, workers, requests, limiter=None):
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    result = {"sent": 0, "succeeded": 0, "throttled": 0, "gave_up": 0}
+
+    def _count(key):
+        with lock:
+            result[key] += 1
+
+    def _one():
+        _count("sent")
+        try:
+            _get(url)
+        except urllib.error.HTTPError as e:
+            if throttle_info(e)[0]:
+                _count("throttled")
+            raise
+
+    def _worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            try:
+                if limiter:
+                    limiter.call(url, _one)
+                else:
+                    _one()
+                _count("succeeded")
+            except urllib.error.HTTPError:
+                _count("gave_up")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    result["wall_s"] = round(wall, 3)
+    result["succeeded_per_s"] = round(result["succeeded"] / wall, 3)
+    if limiter:
+        result["limiter"] = limiter.stats()[host_key(url)]
+    return result
+
+
+def check_yt_dlp_detection(base_url):
+    """A yt-dlp extraction that gets 429 must come back as throttled after the limiter's retries."""
+    import logging
+    logging.disable(logging.CRITICAL)
+    import downloader
+    from rate_limiter import limiter
+
+    try:
+        downloader.extract_info_cached(f"{base_url}/always429/clip.mp3")
+    except Exception as e:
+        throttled, retry_after = throttle_info(e)
+        return {"throttled": throttled, "retry_after": retry_after, "limiter": limiter.stats()}
+    return {"throttled": False, "error": "extraction unexpectedly succeeded"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server-rate", type=float, default=5.0, help="requests/s the server accepts")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=150)
+    args = parser.parse_args()
+
+    server = ThrottlingServer(args.server_rate, args.retry_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    report = {"server_rate": args.server_rate}
+    report["unlimited"] = run_workload(f"{base_url}/item", args.workers, args.requests)
+    # Start well above what the server tolerates so the limiter has to find it
+    limiter = RateLimiter(initial_rate=args.server_rate * 3, max_rate=args.server_rate * 4, burst=2, increase=0.1)
+    time.sleep(1)
+    report["limited"] = run_workload(f"{base_url}/item", args.workers, args.requests, limiter)
+    report["yt_dlp_429"] = check_yt_dlp_detection(base_url)
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
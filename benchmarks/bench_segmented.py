@@ -0,0 +1,197 @@
+"""
+Segmented (multi-connection) downloads against a local server that supports ``Range``.
+
+The server caps every connection at --per-connection-kbps and adds
+--latency-ms before each response, like a throttling CDN on a long link.
+The same file is fetched with 1 connection and then with --connections.
+The script reports wall time and MB/s and checks the sha256 of each result.
+It also checks that:
+  * a connection dropped mid-segment is retried and the file still verifies
+  * a server without Range support makes segmented_download step aside (returns None)
+  * downloader.fetch_source takes the segmented path for a large direct-HTTP source
+
+Usage:
+    python benchmarks/bench_segmented.py --size-mb 32 --connections 8
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from segmented import segmented_download  # noqa: E402
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, per_connection_bps, latency_s, ranges=True):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.directory = Path(directory)
+        self.per_connection_bps = per_connection_bps
+        self.latency_s = latency_s
+        self.ranges = ranges
+        self.drop_next = threading.Event()
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = server.directory / self.path.lstrip("/").split("?")[0]
+        if not path.is_file():
+            self.send_error(404)
+            return
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = _RANGE_RE.match(self.headers.get("Range", "")) if server.ranges else None
+        if match:
+            start = int(match.group(1))
+            end = min(size - 1, int(match.group(2))) if match.group(2) else size - 1
+        time.sleep(server.latency_s)
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "video/mp4" if path.suffix == ".mp4" else "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        # Drop only requests long enough to be real segments, not the 1-byte probe
+        drop = end - start > 1024 * 1024 and server.drop_next.is_set()
+        if drop:
+            server.drop_next.clear()
+        chunk = 64 * 1024
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            sent = 0
+            started = time.monotonic()
+            while remaining > 0:
+                data = f.read(min(chunk, remaining))
+                if drop and sent > (end - start) // 2:
+                    # Mid-segment disconnect
+                    self.close_connection = True
+                    return
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(data)
+                remaining -= len(data)
+                if server.per_connection_bps:
+                    # Per-connection throttle
+                    ahead = sent / server.per_connection_bps - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _serve(directory, per_connection_bps, latency_s, ranges=True):
+    server = RangeServer(directory, per_connection_bps, latency_s, ranges)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--per-connection-kbps", type=int, default=4096, help="KiB/s cap per connection")
+    parser.add_argument("--latency-ms", type=int, default=100)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="smuggy-segmented-"))
+    source = work / "source.bin"
+    with open(source, "wb") as f:
+        f.write(os.urandom(args.size_mb * 1024 * 1024))
+    expected = _sha256(source)
+    server = _serve(work, args.per_connection_kbps * 1024, args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/source.bin"
+    report = {"size_mb": args.size_mb, "per_connection_kbps": args.per_connection_kbps, "latency_ms": args.latency_ms, "runs": []}
+
+    for connections in (1, args.connections):
+        target = work / f"out-{connections}.bin"
+        started = time.perf_counter()
+        if connections == 1:
+            # The single-stream baseline: one plain GET
+            import urllib.request
+            with urllib.request.urlopen(url) as response, open(target, "wb") as f:
+                for block in iter(lambda: response.read(256 * 1024), b""):
+                    f.write(block)
+        else:
+            segmented_download(url, str(target), connections)
+        wall = time.perf_counter() - started
+        report["runs"].append({
+            "connections": connections,
+            "wall_s": round(wall, 3),
+            "mb_per_s": round(args.size_mb / wall, 2),
+            "verified": _sha256(target) == expected,
+        })
+
+    server.drop_next.set()
+    target = work / "out-dropped.bin"
+    segmented_download(url, str(target), args.connections)
+    report["dropped_connection_verified"] = _sha256(target) == expected
+    server.shutdown()
+
+    plain = _serve(work, 0, 0, ranges=False)
+    report["no_range_support_returns"] = segmented_download(
+        f"http://127.0.0.1:{plain.server_address[1]}/source.bin", str(work / "out-plain.bin"), args.connections,
+    )
+    plain.shutdown()
+
+    # End to end: a direct .mp4 link goes through yt-dlp's generic extractor and the segmented path
+    import logging
+    import subprocess
+    logging.disable(logging.CRITICAL)
+    video = work / "clip.mp4"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30:duration=20",
+         "-c:v", "libx264", "-preset", "ultrafast", "-b:v", "6M", str(video)],
+        check=True,
+    )
+    import downloader
+    from metrics import recorder
+    from rate_limiter import limiter
+
+    limiter.configure(initial_rate=1e6, max_rate=1e6, burst=1e6)
+    server = _serve(work, args.per_connection_kbps * 1024, args.latency_ms / 1000)
+    source_info = downloader.fetch_source(
+        f"http://127.0.0.1:{server.server_address[1]}/clip.mp4", "mp4", target_dir=str(work / "lib"), connections=args.connections,
+    )
+    download_span = [s for s in recorder.spans() if s["stage"] == "download"][-1]
+    report["fetch_source"] = {
+        "segmented": bool(download_span.get("segmented")),
+        "bytes": download_span.get("bytes"),
+        "source_bytes": video.stat().st_size,
+        "verified": _sha256(source_info["downloaded_path"]) == _sha256(video),
+    }
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Per-item overhead of fetch_source with and without a SessionPool.
+
+Items are fetched one after another, so the numbers are overhead rather
+than throughput. The media is tiny and served over HTTP/1.1 from a local
+server that adds --handshake-ms to every new connection, standing in for
+TCP+TLS setup on a distant link. Reported per mode: mean and median ms per
+item, connections the server saw, and YoutubeDL instances created.
+Connections are only kept alive with yt-dlp's requests handler
+(``pip install requests``); the report says which handlers are loaded.
+
+Usage (ffmpeg on PATH):
+    python benchmarks/bench_sessions.py --items 30 --handshake-ms 60
+"""
+import argparse
+import functools
+import http.server
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_downloader import generate_media, install_stand_in_extractor  # noqa: E402
+
+
+class _CountingHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake_s)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory, handshake_s):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_CountingHandler, directory=str(directory)))
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.handshake_s = handshake_s
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(mode, items, media_dir, handshake_s):
+    import downloader
+    import info_cache
+    import session_pool
+    from session_pool import SessionPool
+
+    created = []
+    original_init = session_pool._Session.__init__
+
+    def counting_init(self, opts):
+        created.append(1)
+        original_init(self, opts)
+
+    session_pool._Session.__init__ = counting_init
+
+    server = serve(media_dir, handshake_s)
+    port = server.server_address[1]
+    work = Path(tempfile.mkdtemp(prefix="smuggy-sessions-"))
+    info_cache.info_cache.path = work / "info_cache.sqlite3"
+    pool = SessionPool() if mode == "pooled" else None
+    timings = []
+    try:
+        for i in range(items):
+            started = time.perf_counter()
+            source = downloader.fetch_source(
+                f"http://127.0.0.1:{port}/bench/video/tone-1s?i={mode}-{i}", "mp3", target_dir=str(work / "out"), connections=1, sessions=pool,
+            )
+            timings.append(time.perf_counter() - started)
+            source["workspace"].cleanup()
+    finally:
+        if pool:
+            pool.close()
+        session_pool._Session.__init__ = original_init
+    server.shutdown()
+    # The first item pays for imports and extractor loading in both modes
+    steady = timings[1:] or timings
+    return {
+        "mode": mode,
+        "items": items,
+        "mean_ms": round(statistics.mean(steady) * 1000, 1),
+        "median_ms": round(statistics.median(steady) * 1000, 1),
+        "first_item_ms": round(timings[0] * 1000, 1),
+        "connections": server.connections,
+        "youtubedl_instances": len(created),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--handshake-ms", type=int, default=60)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    media_dir = Path(tempfile.mkdtemp(prefix="smuggy-sessions-media-"))
+    generate_media(media_dir, [1])
+    install_stand_in_extractor(media_dir)
+    from rate_limiter import limiter
+    import yt_dlp
+
+    limiter.configure(initial_rate=1e6, max_rate=1e6, burst=1e6)
+    with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        handlers = sorted(h.RH_NAME for h in ydl._request_director.handlers.values())
+    report = {"handshake_ms": args.handshake_ms, "request_handlers": handlers, "runs": []}
+    for mode in ("per-item", "pooled"):
+        report["runs"].append(run(mode, args.items, media_dir, args.handshake_ms / 1000))
+    per_item, pooled = report["runs"]
+    report["saved_ms_per_item"] = round(per_item["mean_ms"] - pooled["mean_ms"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
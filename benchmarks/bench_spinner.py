@@ -0,0 +1,166 @@
+"""
+Idle CPU of the GUI while a long job runs: the queue spinner's cost on screen and off.
+
+Every scenario is a fresh interpreter holding a ConverterWindow whose queue
+spinner is running, as it does for the whole of a job. Nothing else happens,
+so the process CPU time over ``--seconds`` is what the animation costs.
+Scenarios:
+  idle       spinner stopped (the floor)
+  legacy     the old spinner: 16 ms timer, gradient + antialiased arc per paint
+  cached     the current spinner, window shown
+  minimized  the current spinner, window minimized
+  hidden     the current spinner, window hidden (e.g. only the tray icon left)
+Reported per scenario: CPU % of one core, paints per second, and CPU ms per
+paint.
+
+Usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_spinner.py --seconds 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("idle", "legacy", "cached", "minimized", "hidden")
+
+# Runs in the child interpreter; prints one JSON line
+_PROBE = r"""
+import sys
+import time
+sys.path.insert(0, {root!r})
+import gui
+
+from PySide6.QtCore import QEvent, QObject, QRectF, Qt, QTimer
+from PySide6.QtGui import QColor, QConicalGradient, QPainter, QPen
+from PySide6.QtWidgets import QApplication, QWidget
+
+scenario = {scenario!r}
+
+
+class LegacySpinner(QWidget):
+    # The spinner as it was: redraws everything from scratch every 16 ms
+    def __init__(self, parent=None, color=QColor(230, 80, 80), line_width=4):
+        super().__init__(parent)
+        self._angle = 0
+        self._color = color
+        self._line_width = line_width
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._rotate)
+        self.setFixedSize(40, 40)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+
+    def _rotate(self):
+        self._angle = (self._angle + 10) % 360
+        self.update()
+
+    def start(self):
+        self._timer.start(16)
+        self.show()
+
+    def stop(self):
+        self._timer.stop()
+        self.hide()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        side = min(self.width(), self.height())
+        margin = self._line_width + 2
+        rect = QRectF(margin, margin, side - 2 * margin, side - 2 * margin)
+        gradient = QConicalGradient(rect.center(), -self._angle)
+        gradient.setColorAt(0, self._color)
+        gradient.setColorAt(0.7, QColor(self._color.red(), self._color.green(), self._color.blue(), 50))
+        gradient.setColorAt(1, QColor(self._color.red(), self._color.green(), self._color.blue(), 0))
+        pen = QPen()
+        pen.setBrush(gradient)
+        pen.setWidth(self._line_width)
+        pen.setCapStyle(Qt.RoundCap)
+        painter.setPen(pen)
+        painter.drawArc(rect, int(self._angle * 16), 270 * 16)
+
+
+if scenario == "legacy":
+    gui.SpinnerWidget = LegacySpinner
+
+app = QApplication([])
+# Skip the first-run folder prompt / resume dialog, which would block on input
+gui.ConverterWindow._post_init = lambda self: None
+window = gui.ConverterWindow()
+window.resize(1200, 800)
+window.show()
+
+
+class PaintCounter(QObject):
+    paints = 0
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.paints += 1
+        return False
+
+
+counter = PaintCounter()
+window.spinner.installEventFilter(counter)
+if scenario != "idle":
+    window.spinner.start()
+if scenario == "minimized":
+    window.showMinimized()
+elif scenario == "hidden":
+    window.hide()
+
+samples = {{}}
+
+
+def begin():
+    # Let the first paints (and the frame cache) settle before measuring
+    counter.paints = 0
+    samples["cpu"] = time.process_time()
+    samples["wall"] = time.perf_counter()
+    QTimer.singleShot(int({seconds} * 1000), end)
+
+
+def end():
+    samples["cpu"] = time.process_time() - samples["cpu"]
+    samples["wall"] = time.perf_counter() - samples["wall"]
+    app.quit()
+
+
+QTimer.singleShot(500, begin)
+app.exec()
+import json
+print(json.dumps({{
+    "scenario": scenario,
+    "cpu_percent": round(100 * samples["cpu"] / samples["wall"], 2),
+    "paints_per_s": round(counter.paints / samples["wall"], 1),
+    "cpu_ms_per_paint": round(1000 * samples["cpu"] / counter.paints, 3) if counter.paints else None,
+}}))
+"""
+
+
+def run_scenario(scenario, seconds):
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(root=str(ROOT), scenario=scenario, seconds=seconds)],
+        capture_output=True, text=True, timeout=seconds + 60,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="run only these (repeatable)")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    report = {"seconds": args.seconds, "runs": [run_scenario(s, args.seconds) for s in args.scenario or SCENARIOS]}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+GUI cold-start benchmark: import time of ``gui`` and time to the window's first paint.
+
+Every run is a fresh interpreter. The headline number is the median. It also
+checks that yt_dlp/ffmpeg are still unimported at first paint, since they
+should only load afterwards on the warm-up thread.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 10 --output startup.json
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_startup.py   # headless boxes
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints one JSON line
+_PROBE = r"""
+import time
+started = time.perf_counter()
+import sys
+sys.path.insert(0, {root!r})
+import gui
+imported = time.perf_counter()
+
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+app = QApplication([])
+# Skip the first-run folder prompt / resume dialog, which would block on input
+gui.ConverterWindow._post_init = lambda self: None
+window = gui.ConverterWindow()
+
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not hasattr(self, "at"):
+            self.at = time.perf_counter()
+            QTimer.singleShot(0, app.quit)
+        return False
+
+
+probe = FirstPaint()
+window.installEventFilter(probe)
+window.show()
+QTimer.singleShot(10000, app.quit)
+app.exec()
+import json
+print(json.dumps({{
+    "import_s": imported - started,
+    "first_paint_s": getattr(probe, "at", float("nan")) - started,
+    "heavy_modules_at_paint": sorted(m for m in ("yt_dlp", "ffmpeg") if m in sys.modules),
+}}))
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(root=str(ROOT))],
+        capture_output=True, text=True, timeout=60,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    # One discarded run so the OS file cache is warm for every measured run
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_s_median": round(statistics.median(r["import_s"] for r in runs), 4),
+        "first_paint_s_median": round(statistics.median(r["first_paint_s"] for r in runs), 4),
+        "first_paint_s_max": round(max(r["first_paint_s"] for r in runs), 4),
+        "heavy_modules_at_paint": sorted({m for r in runs for m in r["heavy_modules_at_paint"]}),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps({**report, "samples": runs}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
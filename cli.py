@@ -0,0 +1,267 @@
+"""
+Headless command-line entry point for the download engine. It never imports Qt.
+
+Each finished item is written to stdout as one JSON line, in completion
+order. Logs and anything the engine prints go to stderr, so stdout stays
+valid NDJSON.
+
+Usage:
+    python cli.py URL                                # one video
+    python cli.py --playlist PLAYLIST_URL -f mp4 -q 720 -w 8
+    python cli.py URL -t mp3:320 -t mp3:192 -t mp4       # several renditions, one download
+    python cli.py URL -f mp4 -q 1000 --plan               # show the source that would be fetched
+    python cli.py --batch-file urls.txt -o /srv/media
+    python cli.py --resume JOB_ID
+    python cli.py URL -q 192 --source-cache ~/.cache/smuggy   # keep sources for re-encodes
+
+Exit codes: 0 every item succeeded, 1 every item failed or the run could not
+start, 2 bad arguments, 3 some items failed, 130 interrupted.
+
+The first Ctrl-C cancels the run: running encodes are killed, in-progress
+files are removed, and a journaled job can be resumed later. A second Ctrl-C
+exits at once.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import signal
+import sys
+import threading
+
+from batch import dedupe_urls, read_url_file
+from format_select import set_max_height
+from job_manager import create_job, load_job
+from log_utils import configure_logging
+from metrics import DEFAULT_MAX_FILE_BYTES, profile_job, recorder
+from pipeline import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_QUEUE_SIZE, DEFAULT_TRANSCODE_WORKERS
+from process_runner import Cancelled, CancelToken, set_stage_timeout
+from rate_limiter import limiter
+from segmented import DEFAULT_CONNECTIONS
+from source_cache import DEFAULT_MAX_BYTES, source_cache
+from workspace import set_scratch_root
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_INTERRUPTED = 130
+
+
+class ResultWriter:
+    """Writes one JSON line per finished item; safe to call from pipeline worker threads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, index, result):
+        line = json.dumps({"index": index, **result}, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def exit_code_for(results):
+    """Exit status for a run's result list (None when the run produced nothing)."""
+    if not results:
+        return EXIT_FAILED
+    succeeded = sum(1 for r in results if r and r.get("status") == "success")
+    if succeeded == len(results):
+        return EXIT_OK
+    return EXIT_PARTIAL if succeeded else EXIT_FAILED
+
+
+def parse_target(text):
+    """``mp3:192`` -> ("mp3", 192); ``mp4`` -> ("mp4", None)."""
+    fmt, _, quality = text.partition(":")
+    if fmt not in ("mp3", "mp4"):
+        raise argparse.ArgumentTypeError(f"unknown format {fmt!r} (expected mp3 or mp4)")
+    try:
+        return fmt, int(quality) if quality else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad bitrate {quality!r}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="smuggy",
+        description="Download and convert YouTube videos, playlists and URL lists without the GUI.",
+    )
+    parser.add_argument("urls", nargs="*", metavar="URL", help="video URLs; more than one runs as a batch")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--playlist", action="store_true", help="treat the single URL as a playlist")
+    source.add_argument("--batch-file", metavar="PATH", help=".txt or .csv file of URLs")
+    source.add_argument("--resume", metavar="JOB_ID", help="continue a journaled playlist or batch job")
+    parser.add_argument("-f", "--format", dest="fmt", choices=("mp3", "mp4"), default="mp3")
+    parser.add_argument("-q", "--quality", type=int, help="mp3 bitrate in kbps, or mp4 video bitrate in kbps")
+    parser.add_argument(
+        "-t", "--target", dest="targets", action="append", type=parse_target, metavar="FMT[:KBPS]",
+        help="single video only, repeatable: make every target from one download and one ffmpeg run (overrides -f/-q)",
+    )
+    parser.add_argument("-o", "--output", metavar="DIR", help="output folder (default: the saved GUI output folder)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS, help="concurrent downloads")
+    parser.add_argument("--transcode-workers", type=int, default=DEFAULT_TRANSCODE_WORKERS, help="concurrent ffmpeg encodes")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="downloaded sources allowed to wait for an encoder")
+    parser.add_argument("-c", "--connections", type=int, default=DEFAULT_CONNECTIONS, help="parallel connections per large file (1 turns segmenting off)")
+    parser.add_argument("--max-rate", type=float, metavar="N", help="at most N requests per second to one site (default: %(default)s)", default=limiter.max_rate)
+    parser.add_argument("--scratch-dir", metavar="DIR", help="fast local folder for in-progress downloads and encodes")
+    parser.add_argument("--source-cache", metavar="DIR", help="keep downloaded sources in DIR so re-encodes of the same video skip the download")
+    parser.add_argument("--source-cache-size", type=int, metavar="MB", default=DEFAULT_MAX_BYTES // 2 ** 20, help="source cache budget in MB (default: %(default)s)")
+    parser.add_argument("--max-height", type=int, metavar="PX", help="mp4: download no source taller than PX when a lower one exists")
+    parser.add_argument("--plan", action="store_true", help="print the source format each URL would download and its estimated size, then exit")
+    parser.add_argument("--stream", action="store_true", help="single video only: pipe the download straight into ffmpeg")
+    parser.add_argument("--download-timeout", type=float, metavar="SECONDS", help="give up on an item whose download runs longer than this")
+    parser.add_argument("--encode-timeout", type=float, metavar="SECONDS", help="give up on an item whose encode runs longer than this")
+    parser.add_argument("--no-journal", action="store_true", help="do not journal playlist/batch jobs for --resume")
+    metrics_file = parser.add_mutually_exclusive_group()
+    metrics_file.add_argument("--metrics-file", metavar="PATH", help="append per-stage timings to PATH (default: metrics.jsonl in the app's data folder)")
+    metrics_file.add_argument("--no-metrics-file", action="store_true", help="keep per-stage timings in memory only")
+    parser.add_argument("--metrics-file-size", type=int, metavar="MB", default=DEFAULT_MAX_FILE_BYTES // 2 ** 20, help="rotate the metrics file past MB (default: %(default)s)")
+    parser.add_argument("--profile", metavar="PATH", help="write collapsed-stack samples of the run to PATH")
+    parser.add_argument("--log-level", default="WARNING", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    return parser
+
+
+def _check_args(parser, args):
+    if args.resume:
+        if args.urls:
+            parser.error("--resume takes no URLs")
+    elif args.batch_file:
+        if args.urls:
+            parser.error("--batch-file takes no URLs")
+    elif not args.urls:
+        parser.error("give a URL, --batch-file or --resume")
+    elif args.playlist and len(args.urls) != 1:
+        parser.error("--playlist takes exactly one URL")
+    if args.stream and (args.playlist or args.batch_file or args.resume or len(args.urls) > 1):
+        parser.error("--stream only applies to a single video")
+    if args.targets and (args.playlist or args.batch_file or args.resume or len(args.urls) > 1):
+        parser.error("--target only applies to a single video")
+    if args.plan and (args.playlist or args.resume or args.targets):
+        parser.error("--plan only applies to video URLs and --batch-file")
+    if args.targets and args.stream:
+        parser.error("--target can't be combined with --stream")
+    if args.max_rate <= 0:
+        parser.error("--max-rate must be positive")
+    for name in ("download_timeout", "encode_timeout"):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    for name in ("workers", "transcode_workers", "queue_size", "connections", "source_cache_size", "metrics_file_size"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if args.max_height is not None and args.max_height < 1:
+        parser.error("--max-height must be at least 1")
+
+
+def run(args, writer, token=None):
+    """Run the job described by ``args``, sending each finished item to ``writer``; ``token`` cancels it."""
+    # Imported here so ``--help`` and argument errors stay fast
+    from downloader import download_and_convert, download_and_convert_targets, download_batch, download_playlist, plan_source, resume_job
+
+    options = {
+        "max_workers": args.workers,
+        "transcode_workers": args.transcode_workers,
+        "queue_size": args.queue_size,
+        "on_item": writer,
+        "connections": args.connections,
+        "token": token,
+    }
+    if args.resume:
+        if load_job(args.resume) is None:
+            logger.error("Unknown job", extra={"job_id": args.resume})
+            return EXIT_FAILED
+        # Items finished before the interruption are not written again, but count towards the exit code
+        return exit_code_for(resume_job(args.resume, **options))
+
+    if args.playlist:
+        job_id = None if args.no_journal else create_job("playlist", args.fmt, args.quality, target_dir=args.output, source_url=args.urls[0])
+        if job_id:
+            print(f"Job {job_id} (resume with --resume {job_id})", file=sys.stderr)
+        # None means the playlist itself could not be read
+        return exit_code_for(download_playlist(args.urls[0], args.fmt, args.quality, target_dir=args.output, job_id=job_id, **options))
+
+    # Deduplicated before anything is journaled, so journal rows line up with the items download_batch runs
+    urls = dedupe_urls(read_url_file(args.batch_file) if args.batch_file else args.urls)
+    if args.plan:
+        results = []
+        for index, url in enumerate(urls):
+            try:
+                result = {**plan_source(url, args.fmt, args.quality), "status": "success"}
+            except Exception as e:
+                result = {"url": url, "error": str(e), "status": "failed"}
+            writer(index, result)
+            results.append(result)
+        return exit_code_for(results)
+    if len(urls) == 1 and not args.batch_file:
+        try:
+            if args.targets:
+                file_ids = download_and_convert_targets(urls[0], args.targets, target_dir=args.output, connections=args.connections, token=token)
+                result = {"url": urls[0], "file_ids": file_ids, "status": "success"}
+            else:
+                file_id = download_and_convert(
+                    urls[0], args.fmt, args.quality, target_dir=args.output, stream=args.stream, connections=args.connections, token=token,
+                )
+                result = {"url": urls[0], "file_id": file_id, "status": "success"}
+        except Cancelled as e:
+            result = {"url": urls[0], "error": str(e), "status": "cancelled"}
+        except Exception as e:
+            result = {"url": urls[0], "error": str(e), "status": "failed"}
+        writer(0, result)
+        return exit_code_for([result])
+
+    job_id = None if args.no_journal else create_job("batch", args.fmt, args.quality, target_dir=args.output, urls=urls)
+    if job_id:
+        print(f"Job {job_id} (resume with --resume {job_id})", file=sys.stderr)
+    return exit_code_for(download_batch(urls, args.fmt, args.quality, job_id, target_dir=args.output, **options))
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check_args(parser, args)
+    configure_logging(getattr(logging, args.log_level))
+    limiter.configure(max_rate=args.max_rate, min_rate=min(limiter.min_rate, args.max_rate))
+    if args.scratch_dir:
+        set_scratch_root(args.scratch_dir)
+    if args.source_cache or source_cache.enabled:
+        source_cache.configure(args.source_cache or source_cache.root, args.source_cache_size * 2 ** 20)
+    recorder.configure(None if args.no_metrics_file else args.metrics_file or recorder.path, args.metrics_file_size * 2 ** 20)
+    set_max_height(args.max_height)
+    set_stage_timeout("download", args.download_timeout)
+    set_stage_timeout("encode", args.encode_timeout)
+    set_stage_timeout("stream", args.download_timeout)
+
+    writer = ResultWriter(sys.stdout)
+    token = CancelToken()
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: _interrupt(token))
+    # The engine and yt-dlp print progress lines; keep stdout for results only
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.profile:
+                with profile_job(args.profile):
+                    code = run(args, writer, token)
+            else:
+                code = run(args, writer, token)
+            return EXIT_INTERRUPTED if token.cancelled else code
+        except KeyboardInterrupt:
+            return EXIT_INTERRUPTED
+        except Exception as e:
+            logger.error("Run failed", extra={"error": str(e)})
+            return EXIT_FAILED
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+
+
+def _interrupt(token):
+    if token.cancelled:
+        raise KeyboardInterrupt
+    print("Cancelling; press Ctrl-C again to quit at once", file=sys.stderr)
+    # Off the signal handler: cancel callbacks take locks the interrupted main thread may hold
+    threading.Thread(target=token.cancel, name="cancel", daemon=True).start()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,17 @@
 ICON_PATH = "logo.png"
 ICO_ICON_PATH = "icon.ico"
-OUTPUT_DIR_FILE = "output_dir.txt"
\ No newline at end of file
+OUTPUT_DIR_FILE = "output_dir.txt"
+INFO_CACHE_FILE = "info_cache.sqlite3"
+LIBRARY_INDEX_FILE = ".smuggy_library.sqlite3"
+JOBS_DIR = "jobs"
+# Per-user folder for the journal, info cache and metrics in a frozen (PyInstaller) build
+APP_DATA_DIR_NAME = "smuggy"
+METRICS_FILE = "metrics.jsonl"
+# Where per-stage spans are appended instead of METRICS_FILE; empty turns the file off
+METRICS_FILE_ENV = "SMUGGY_METRICS_FILE"
+# Scratch space for in-progress downloads/encodes; defaults to the system temp dir
+SCRATCH_DIR_ENV = "SMUGGY_SCRATCH_DIR"
+SCRATCH_DIR_NAME = "smuggy-scratch"
+# Optional cache of downloaded sources; off unless a directory is configured
+SOURCE_CACHE_DIR_ENV = "SMUGGY_SOURCE_CACHE_DIR"
+SOURCE_CACHE_INDEX_FILE = "index.sqlite3"
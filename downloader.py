@@ -1,25 +1,52 @@
 import json
 import logging
 import os
+import queue
 import re
+import threading
+import time
 from datetime import datetime, timezone
 
-import ffmpeg
-import yt_dlp
-from ffmpeg import Error as FFmpegError
-from file_utils import cleanup_file, generate_uuid_filename, get_media_path, MEDIA_DIR
-# from .job_manager import update_job_progress
+from batch import dedupe_urls
+from file_utils import cleanup_file, generate_uuid_filename, get_media_dir, get_media_path
+from format_select import covers, max_height, narrow_info, select_source
+from info_cache import info_cache
+from job_manager import DONE, FAILED, QUEUED, RUNNING, add_items, finish_job, load_job, mark_enumerated, mark_item, pending_indexes, update_job_progress
+from library_index import library_for
+from lazy_import import LazyModule
+from metrics import recorder, span
+from pipeline import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_QUEUE_SIZE, DEFAULT_TRANSCODE_WORKERS, run_pipeline
+from process_runner import Cancelled, ProcessError, run_process, stage
+from progress import download_event, encode_event, for_item
+from rate_limiter import host_key, http_status, limiter, throttle_info
+from segmented import DEFAULT_CONNECTIONS, MIN_SEGMENT_SIZE, SEGMENTED_PROTOCOLS, segmented_download
+from session_pool import SessionPool, session_from
+from source_cache import source_cache
+from streaming import is_streamable, stream_into_ffmpeg
+from transcode_scheduler import scheduler
+from url_utils import extract_video_id
+from workspace import Workspace
 
 METADATA_EXT = ".metadata.json"
+DEFAULT_MAX_WORKERS = DEFAULT_DOWNLOAD_WORKERS
+# Source codecs that can go into an .mp4 as-is
+REMUX_VIDEO_CODECS = ("h264",)
+REMUX_AUDIO_CODECS = ("aac",)
+# url -> url hops followed when opening a playlist (channel -> uploads tab, ...)
+MAX_PLAYLIST_REDIRECTS = 3
+# Held while a final filename is chosen and published, so two items can't claim the same name
+_publish_lock = threading.Lock()
+
+# yt_dlp and ffmpeg are slow to import; load them on first use so the GUI can paint first
+yt_dlp = LazyModule("yt_dlp")
+ffmpeg = LazyModule("ffmpeg")
 
 logger = logging.getLogger(__name__)
-if not logger.handlers:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 
 # Write metadata with timestamp
 def write_metadata(file_id, base_dir=None):
     metadata = {"timestamp": datetime.now(timezone.utc).isoformat()}
-    target_dir = base_dir if base_dir else MEDIA_DIR
+    target_dir = base_dir if base_dir else get_media_dir()
     if not os.path.exists(target_dir):
         os.makedirs(target_dir, exist_ok=True)
     meta_path = os.path.join(target_dir, file_id + METADATA_EXT)
@@ -27,6 +54,12 @@ def write_metadata(file_id, base_dir=None):
         json.dump(metadata, f)
 
 
+def warm_up():
+    """Import the heavy dependencies ahead of the first job (e.g. on a background thread)."""
+    yt_dlp.load()
+    ffmpeg.load()
+
+
 def sanitize_filename(title):
     # Remove invalid filename characters and trim
     title = re.sub(r'[\\/:*?"<>|]', '', title)
@@ -34,155 +67,984 @@ def sanitize_filename(title):
     title = re.sub(r'[^\x00-\x7F]+', '', title)
     # Collapse whitespace
     title = re.sub(r'\s+', ' ', title).strip()
-    # Limit filename length (e.g., 100 chars)
-    return title[:100]
+    # Limit filename length (e.g., 100 chars); an all non-ASCII title would otherwise leave only the extension
+    return title[:100].strip() or "untitled"
+
+
+# Options of the extraction-only YoutubeDL
+INFO_OPTS = {
+    "quiet": True,
+    "ignoreerrors": False,
+    "noplaylist": True,
+    "skip_download": True,
+}
+# Sources are saved as source.<ext> inside the item's workspace, which is passed per call
+SOURCE_OUTTMPL = "source.%(ext)s"
+
+
+def extract_info_cached(url, video_id=None, sessions=None, token=None):
+    """Return ``(info, from_cache)`` for ``url``, using the info cache when possible.
+
+    ``sessions`` is the job's SessionPool; without one a throwaway YoutubeDL is used.
+    Cancelling ``token`` ends a wait for the rate limiter.
+    """
+    if video_id:
+        info = info_cache.get(video_id)
+        if info is not None:
+            logger.info("Info cache hit", extra={"video_id": video_id})
+            return info, True
+    def _extract():
+        with span("extract", url), session_from(sessions, INFO_OPTS) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False), remove_private_keys=True)
+
+    info = limiter.call(url, _extract, token=token)
+    if video_id:
+        info_cache.put(video_id, info)
+    return info, False
+
+
+def find_in_library(url, fmt, quality, base_dir):
+    """Return the filename if ``url`` was already converted to fmt/quality in ``base_dir``, without network access."""
+    video_id = extract_video_id(url)
+    if not video_id:
+        return None
+    filename = library_for(base_dir).lookup(video_id, fmt, quality)
+    if filename:
+        logger.info("Already in library, skipping", extra={"video_id": video_id, "file_id": filename})
+    return filename
+
+
+def _record_in_library(source, quality):
+    if source.get("video_id"):
+        library_for(source["base_dir"]).record(source["video_id"], source["fmt"], quality, source["filename"])
+
+
+def _segmented_fetch(ydl, info, temp_path, connections, progress, token=None):
+    """Fetch the selected format(s) over ``connections`` parallel range requests.
+
+    Video and audio that yt-dlp would merge are fetched one after the other
+    and joined with an ffmpeg stream copy. Returns ``(selected_info, path)``,
+    or None when the source is not plain HTTP, is too small, or the server
+    doesn't support ranges.
+    """
+    selected = ydl.process_ie_result(dict(info), download=False)
+    formats = selected.get("requested_formats") or [selected]
+    if not all(f.get("protocol") in SEGMENTED_PROTOCOLS and f.get("url") for f in formats):
+        return None
+    # Known to be too small to split: skip the range probe round-trip
+    if all(f.get("filesize") or f.get("filesize_approx") for f in formats):
+        if sum(f.get("filesize") or f.get("filesize_approx") for f in formats) < 2 * MIN_SEGMENT_SIZE:
+            return None
+    path = f"{os.path.splitext(temp_path)[0]}.{selected.get('ext') or formats[0]['ext']}"
+    if len(formats) == 1:
+        size = segmented_download(formats[0]["url"], path, connections, formats[0].get("http_headers"), progress, token)
+        return (selected, path) if size else None
+    parts = []
+    try:
+        for part_format in formats:
+            part = f"{path}.f{part_format['format_id']}.{part_format['ext']}"
+            if not segmented_download(part_format["url"], part, connections, part_format.get("http_headers"), progress, token):
+                return None
+            parts.append(part)
+        _run_ffmpeg(ffmpeg.output(*(ffmpeg.input(part) for part in parts), path, c="copy"), token=token)
+    finally:
+        for part in parts:
+            cleanup_file(part)
+    return selected, path
+
 
+def _lookup_cached_source(url, fmt, quality, video_id, ydl_opts, sessions):
+    """Find ``url``'s source in the source cache without touching the network.
 
-def download_and_convert(url, fmt, quality, target_dir=None):
-    logger.info("Starting download", extra={"url": url, "fmt": fmt, "quality": quality})
-    base_dir = target_dir if target_dir else MEDIA_DIR
+    The format is selected offline when the info cache still has the info
+    dict, and a source with that format ID matches. Either way, a source
+    fetched for a target that covers this one (``format_select.covers``)
+    matches too, e.g. a cached mp4 source for an mp3. Returns ``(entry,
+    info)``; ``info`` is the cached info dict (or None) so a miss doesn't
+    look it up twice.
+    """
+    format_id = None
+    info = info_cache.get(video_id)
+    if info is not None:
+        try:
+            with session_from(sessions, ydl_opts) as ydl:
+                selected = ydl.process_ie_result(narrow_info(info, select_source(info, fmt, quality)), download=False)
+                format_id = selected.get("format_id")
+        except Exception as e:
+            logger.info("Offline format selection failed", extra={"video_id": video_id, "error": str(e)})
+    height_cap = max_height() if fmt == "mp4" else None
+    entry = source_cache.lookup(
+        video_id, format_id, lambda cached: covers(cached["fmt"], cached["quality"], cached["max_height"], fmt, quality, height_cap),
+    )
+    if entry:
+        logger.info("Source cache hit", extra={"video_id": video_id, "format_id": entry["format_id"], "sha256": entry["sha256"]})
+    return entry, info
+
+
+def _source_from_cache(url, fmt, video_id, base_dir, entry):
+    """A source dict for ``fetch_source`` backed by a cached file linked into a fresh workspace; None if it is gone."""
+    filename = f"{sanitize_filename(entry['title'] or 'downloaded_file')}.{fmt}"
+    workspace = Workspace.create()
+    try:
+        with span("cache_hit", url) as hit_span:
+            downloaded_path = source_cache.materialize(entry, workspace.file(f"source.{entry['ext']}"))
+            hit_span["bytes"] = entry["size"]
+    except OSError as e:
+        # Evicted between the lookup and the link; download it instead
+        workspace.cleanup()
+        logger.info("Cached source vanished", extra={"video_id": video_id, "error": str(e)})
+        return None
+    except BaseException:
+        workspace.cleanup()
+        raise
+    return {
+        "url": url,
+        "fmt": fmt,
+        "video_id": video_id,
+        "base_dir": base_dir,
+        "filename": filename,
+        "target_path": workspace.file(filename),
+        "downloaded_path": downloaded_path,
+        "workspace": workspace,
+    }
+
+
+def fetch_source(
+    url, fmt, target_dir=None, quality=None, progress=None, connections=DEFAULT_CONNECTIONS, sessions=None, token=None, check_library=True,
+):
+    """Download stage: fetch the source media for ``url`` into the item's scratch workspace.
+
+    Returns a source dict that ``transcode_source`` turns into the final file.
+    Items already in the library index come back with ``skipped`` set and
+    no download, unless ``check_library`` is False. ``progress`` receives download events from yt-dlp. Large
+    plain-HTTP sources are fetched over ``connections`` parallel range
+    requests, and DASH/HLS fragments use the same count; pass 1 to turn that off.
+    ``sessions`` is the job's SessionPool of warm YoutubeDL instances.
+    With the source cache on, a cached source is linked in instead of
+    downloaded, and a downloaded one is added to the cache.
+    The source streams are the smallest that satisfy ``fmt`` at ``quality``
+    (see format_select), not simply the best on offer.
+    Cancelling ``token`` stops the transfer at its next chunk and raises
+    Cancelled; the workspace is removed.
+    """
+    if fmt not in ("mp3", "mp4"):
+        raise ValueError("Invalid format")
+    logger.info("Starting download", extra={"url": url, "fmt": fmt})
+    base_dir = target_dir if target_dir else get_media_dir()
     if not os.path.exists(base_dir):
         os.makedirs(base_dir, exist_ok=True)
+    existing = find_in_library(url, fmt, quality, base_dir) if check_library else None
+    if existing:
+        return {"url": url, "fmt": fmt, "base_dir": base_dir, "filename": existing, "skipped": True}
+    if token:
+        token.raise_if_cancelled()
     ext = fmt
-    ydl_info_opts = {
+    video_id = extract_video_id(url)
+    ydl_opts = {
+        "outtmpl": SOURCE_OUTTMPL,
+        "format": "bestaudio/best" if fmt == "mp3" else "bestvideo+bestaudio/best",
+        "noplaylist": True,
         "quiet": True,
         "ignoreerrors": False,
-        "noplaylist": True,
-        "skip_download": True,
+        "concurrent_fragment_downloads": max(1, connections),
     }
-    try:
-        with yt_dlp.YoutubeDL(ydl_info_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-        logger.info("Fetched info", extra={"title": info.get('title'), "ext": info.get('ext')})
-        title = info.get('title', 'downloaded_file')
-        safe_title = sanitize_filename(title)
-        filename = f"{safe_title}.{ext}"
-        target_path = os.path.join(base_dir, filename)
-        # Always download to a temp file to avoid in-place overwrite
-        temp_filename = f"{safe_title}_temp.{info.get('ext', ext)}"
-        temp_path = os.path.join(base_dir, temp_filename)
-        ydl_opts = {
-            "outtmpl": temp_path,
-            "format": "bestaudio/best" if fmt == "mp3" else "bestvideo+bestaudio/best",
-            "noplaylist": True,
-            "quiet": True,
-            "ignoreerrors": False,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            downloaded_path = ydl.prepare_filename(info)
-            logger.info("Downloaded file", extra={"downloaded_path": downloaded_path})
-            # If the downloaded file is already in the target format and name, just write metadata
-            if os.path.abspath(downloaded_path) == os.path.abspath(target_path):
-                write_metadata(filename)
-                return filename
-            # Conversion if needed
-            if fmt == "mp3":
-                try:
-                    (
-                        ffmpeg
-                        .input(downloaded_path)
-                        .output(target_path, audio_bitrate=f"{quality}k" if quality else "320k", format="mp3", acodec="libmp3lame")
-                        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-                    )
-                except FFmpegError as fe:
-                    cleanup_file(downloaded_path)
-                    err = fe.stderr.decode('utf-8', errors='ignore')
-                    logger.error("FFmpeg mp3 error", extra={"error": err})
-                    raise Exception(f"ffmpeg error: {err}")
-                cleanup_file(downloaded_path)
-                write_metadata(filename, base_dir)
-                print(f"Converted and saved: {filename}")
-                logger.info("MP3 conversion complete", extra={"target_path": target_path})
-                return filename
-            elif fmt == "mp4":
+    info = None
+    if source_cache.enabled and video_id:
+        cached, info = _lookup_cached_source(url, fmt, quality, video_id, ydl_opts, sessions)
+        source = _source_from_cache(url, fmt, video_id, base_dir, cached) if cached else None
+        if source:
+            return source
+    if info is None:
+        info, from_cache = extract_info_cached(url, video_id, sessions, token)
+    else:
+        from_cache = True
+    logger.info("Fetched info", extra={"title": info.get('title'), "ext": info.get('ext')})
+    # Only offer yt-dlp the smallest streams that satisfy the output
+    selection = select_source(info, fmt, quality)
+    if selection:
+        logger.info("Selected source format", extra=selection.describe())
+        info = narrow_info(info, selection)
+    title = info.get('title', 'downloaded_file')
+    safe_title = sanitize_filename(title)
+    filename = f"{safe_title}.{ext}"
+    # Download and encode in this item's own scratch dir; only the finished file reaches base_dir
+    workspace = Workspace.create()
+    target_path = workspace.file(filename)
+    temp_path = workspace.file(f"source.{info.get('ext', ext)}")
+
+    def _reextract(ydl, download_span):
+        nonlocal from_cache
+        info_cache.invalidate(video_id)
+        from_cache = False
+        logger.info("Cached info stale, re-extracting", extra={"video_id": video_id})
+        download_span["reextracted"] = True
+        fresh = ydl.extract_info(url, download=False)
+        return ydl.process_ie_result(narrow_info(fresh, select_source(fresh, fmt, quality)), download=True)
+
+    def _download(download_token):
+        def _hook(data):
+            # yt-dlp lets DownloadCancelled out of a progress hook and stops the transfer
+            if download_token.cancelled:
+                raise yt_dlp.utils.DownloadCancelled(download_token.message)
+            if progress:
+                progress(download_event(data))
+
+        started = time.monotonic()
+        with span("download", url) as download_span, session_from(sessions, ydl_opts, _hook, workspace.path) as ydl:
+            if selection:
+                download_span["format_id"] = selection.format_id
+                download_span["estimated_bytes"] = selection.estimated_bytes
+            segmented = None
+            stale = False
+            if connections > 1:
                 try:
-                    (
-                        ffmpeg
-                        .input(downloaded_path)
-                        .output(target_path, video_bitrate=f"{quality}k" if quality else None, format="mp4", vcodec="libx264", acodec="aac")
-                        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-                    )
-                except FFmpegError as fe:
-                    cleanup_file(downloaded_path)
-                    err = fe.stderr.decode('utf-8', errors='ignore')
-                    logger.error("FFmpeg mp4 error", extra={"error": err})
-                    raise Exception(f"ffmpeg error: {err}")
-                cleanup_file(downloaded_path)
-                write_metadata(filename, base_dir)
-                logger.info("MP4 conversion complete", extra={"target_path": target_path})
-                return filename
+                    segmented = _segmented_fetch(ydl, info, temp_path, connections, progress, download_token)
+                except Exception as e:
+                    download_token.raise_if_cancelled()
+                    # A 403 on cached info is an expired stream URL, not throttling; only real
+                    # throttling goes to the limiter's backoff, anything else to the plain download
+                    stale = from_cache and http_status(e) == 403
+                    if throttle_info(e)[0] and not stale:
+                        raise
+                    logger.info("Segmented download failed, falling back", extra={"from_cache": from_cache, "error": str(e)})
+            if segmented:
+                result, path = segmented
+                download_span["segmented"] = True
             else:
-                raise ValueError("Invalid format")
+                if stale:
+                    result = _reextract(ydl, download_span)
+                else:
+                    try:
+                        # Reuse the extraction from above instead of a second extract_info round-trip
+                        result = ydl.process_ie_result(dict(info), download=True)
+                    except yt_dlp.utils.DownloadCancelled:
+                        download_token.raise_if_cancelled()
+                        raise
+                    except yt_dlp.utils.DownloadError:
+                        # Stale cached stream URLs; re-extract once
+                        if not from_cache:
+                            raise
+                        result = _reextract(ydl, download_span)
+                path = ydl.prepare_filename(result)
+            download_span["bytes"] = _file_size(path)
+        limiter.report_transfer(host_key(url), download_span["bytes"], time.monotonic() - started)
+        return result, path
+
+    try:
+        with stage(token, "download") as download_token:
+            info, downloaded_path = limiter.call(url, lambda: _download(download_token), token=download_token)
+    except BaseException:
+        workspace.cleanup()
+        raise
+    logger.info("Downloaded file", extra={"downloaded_path": downloaded_path})
+    if source_cache.enabled:
+        with span("cache_store", url) as store_span:
+            height_cap = max_height() if fmt == "mp4" else None
+            if source_cache.put(video_id or info.get("id"), info.get("format_id"), fmt, title, downloaded_path, quality, height_cap):
+                store_span["bytes"] = _file_size(downloaded_path)
+    return {
+        "url": url,
+        "fmt": fmt,
+        "video_id": video_id or info.get("id"),
+        "base_dir": base_dir,
+        "filename": filename,
+        "target_path": target_path,
+        "downloaded_path": downloaded_path,
+        "workspace": workspace,
+    }
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _encode(source, kind, output, progress, token=None):
+    """Run one ffmpeg job for ``source`` under the transcode scheduler, timed as an encode span."""
+    with scheduler.slot(kind) as slot:
+        with span("encode", source["url"], kind=kind, threads=slot.threads, queue_wait_s=round(slot.wait_time, 6)) as encode_span:
+            _run_ffmpeg(output(slot.threads), progress, token)
+            encode_span["bytes"] = _file_size(source["target_path"])
+
+
+def _free_filename(base_dir, filename, video_id):
+    """``filename``, or a variant of it that doesn't hold another video's output in ``base_dir``.
+
+    An existing file is only replaced when the library index has it as this
+    video's. Otherwise the video ID is added (``Title [id].mp3``), then a
+    counter. Titles with no ASCII left after sanitizing all come out as
+    ``.mp3``, so this is what keeps a playlist of them apart.
+    """
+    # Not os.path.splitext: it reads ".mp3" as a dotfile with no extension
+    stem, _, ext = filename.rpartition(".")
+    candidates = [filename]
+    if video_id:
+        stem = f"{stem} [{video_id}]".lstrip()
+        candidates.append(f"{stem}.{ext}")
+    library = library_for(base_dir)
+    for candidate in candidates:
+        if not os.path.exists(os.path.join(base_dir, candidate)) or (video_id and library.owner(candidate) == video_id):
+            return candidate
+    counter = 2
+    while True:
+        candidate = f"{stem} ({counter}).{ext}".lstrip()
+        if not os.path.exists(os.path.join(base_dir, candidate)):
+            return candidate
+        counter += 1
+
+
+def _publish(workspace, path, base_dir, filename, video_id):
+    """Publish ``path`` into ``base_dir`` under ``filename`` or a free variant of it; returns the final filename."""
+    with _publish_lock:
+        final = _free_filename(base_dir, filename, video_id)
+        if final != filename:
+            logger.info("Output name taken by another video, renamed", extra={"requested": filename, "final": final})
+        workspace.publish(path, base_dir, final)
+    return final
+
+
+def _finish_output(source, quality):
+    """Move the finished file into the output folder, write its metadata sidecar and index it.
+
+    Returns the final filename, which differs from ``source["filename"]``
+    when another video's output already has that name.
+    """
+    with span("publish", source["url"]):
+        source["filename"] = _publish(source["workspace"], source["target_path"], source["base_dir"], source["filename"], source.get("video_id"))
+    with span("metadata", source["url"]):
+        write_metadata(source["filename"], source["base_dir"])
+    _record_in_library(source, quality)
+    return source["filename"]
+
+
+def _run_ffmpeg(output, progress=None, token=None):
+    """Run an ffmpeg-python output graph as a child that ``token`` can kill.
+
+    With ``progress``, ``-progress`` updates are streamed as encode events.
+    Raises ffmpeg.Error with the tail of stderr on failure, like ``.run()``,
+    and Cancelled or StageTimeout when the token stops it.
+    """
+    fields = {}
+    on_line = None
+    if progress is not None:
+        output = output.global_args("-progress", "pipe:1", "-nostats")
+
+        def on_line(raw):
+            nonlocal fields
+            key, _, value = raw.decode("utf-8", errors="ignore").strip().partition("=")
+            fields[key] = value
+            # Each -progress block ends with progress=continue|end
+            if key == "progress":
+                progress(encode_event(fields))
+                fields = {}
+    else:
+        output = output.global_args("-nostats")
+    try:
+        run_process(output.compile(overwrite_output=True), token, on_line)
+    except ProcessError as e:
+        raise ffmpeg.Error("ffmpeg", b"", e.stderr)
+
+
+def probe_codecs(path):
+    """Return ``(video_codec, audio_codec)`` of the first streams in ``path``; None when absent."""
+    streams = ffmpeg.probe(path).get("streams", [])
+    video = next((st.get("codec_name") for st in streams if st.get("codec_type") == "video"), None)
+    audio = next((st.get("codec_name") for st in streams if st.get("codec_type") == "audio"), None)
+    return video, audio
+
+
+def _can_remux_mp4(path, quality):
+    # A bitrate cap always needs a real encode
+    if quality:
+        return False
+    try:
+        video, audio = probe_codecs(path)
+    except (ffmpeg.Error, OSError, ValueError) as e:
+        logger.info("Probe failed, falling back to transcode", extra={"path": path, "error": str(e)})
+        return False
+    logger.info("Probed source", extra={"video_codec": video, "audio_codec": audio})
+    return video in REMUX_VIDEO_CODECS and (audio is None or audio in REMUX_AUDIO_CODECS)
+
+
+def _mp3_output_kwargs(quality):
+    return {"audio_bitrate": f"{quality}k" if quality else "320k", "format": "mp3", "acodec": "libmp3lame"}
+
+
+def _mp4_output(downloaded_path, quality):
+    """``(kind, output kwargs)`` for an mp4 of ``downloaded_path``: a stream copy when the codecs allow it, else x264."""
+    if _can_remux_mp4(downloaded_path, quality):
+        logger.info("Remuxing mp4 with stream copy", extra={"downloaded_path": downloaded_path})
+        return "remux", {"format": "mp4", "c": "copy"}
+    output_kwargs = {"format": "mp4", "vcodec": "libx264", "acodec": "aac"}
+    if quality:
+        output_kwargs["video_bitrate"] = f"{quality}k"
+    return "mp4", output_kwargs
+
+
+def transcode_source(source, quality, progress=None, token=None):
+    """Transcode stage: convert a fetched source to its target format and publish it.
+
+    The item's scratch workspace is removed afterwards, whether the encode
+    succeeded, failed or was cancelled. ``progress`` receives encode events
+    parsed from ffmpeg ``-progress``. Cancelling ``token`` kills ffmpeg and
+    raises Cancelled.
+    """
+    if source.get("skipped"):
+        return source["filename"]
+    try:
+        with stage(token, "encode") as encode_token:
+            return _transcode(source, quality, progress, encode_token)
+    finally:
+        with span("cleanup", source["url"]):
+            source["workspace"].cleanup()
+
+
+def _transcode(source, quality, progress, token):
+    fmt = source["fmt"]
+    base_dir = source["base_dir"]
+    filename = source["filename"]
+    target_path = source["target_path"]
+    downloaded_path = source["downloaded_path"]
+    # If the downloaded file is already in the target format and name, just publish it
+    if os.path.abspath(downloaded_path) == os.path.abspath(target_path):
+        return _finish_output(source, quality)
+    # Conversion if needed
+    if fmt == "mp3":
+        try:
+            _encode(
+                source,
+                "mp3",
+                lambda threads: ffmpeg.input(downloaded_path).audio.output(target_path, threads=threads, **_mp3_output_kwargs(quality)),
+                progress,
+                token,
+            )
+        except ffmpeg.Error as fe:
+            err = fe.stderr.decode('utf-8', errors='ignore')
+            logger.error("FFmpeg mp3 error", extra={"error": err})
+            raise Exception(f"ffmpeg error: {err}")
+        filename = _finish_output(source, quality)
+        print(f"Converted and saved: {filename}")
+        logger.info("MP3 conversion complete", extra={"target_path": os.path.join(base_dir, filename)})
+        return filename
+    elif fmt == "mp4":
+        kind, output_kwargs = _mp4_output(downloaded_path, quality)
+        try:
+            _encode(
+                source,
+                kind,
+                lambda threads: ffmpeg.input(downloaded_path).output(target_path, threads=threads, **output_kwargs),
+                progress,
+                token,
+            )
+        except ffmpeg.Error as fe:
+            err = fe.stderr.decode('utf-8', errors='ignore')
+            logger.error("FFmpeg mp4 error", extra={"error": err})
+            raise Exception(f"ffmpeg error: {err}")
+        filename = _finish_output(source, quality)
+        logger.info("MP4 conversion complete", extra={"target_path": os.path.join(base_dir, filename)})
+        return filename
+    else:
+        raise ValueError("Invalid format")
+
+
+def target_filename(title, fmt, quality, targets):
+    """Filename of one of ``targets`` (``(fmt, quality)`` pairs); the bitrate is added when several share ``fmt``."""
+    if quality and sum(1 for target_fmt, _ in targets if target_fmt == fmt) > 1:
+        return f"{title} ({quality}k).{fmt}"
+    return f"{title}.{fmt}"
+
+
+def transcode_targets(source, targets, progress=None, token=None, filenames=None):
+    """Transcode stage for several renditions: make every ``(fmt, quality)`` in ``targets`` from one ffmpeg run.
+
+    The source is decoded once and fed to one encoder (or stream copy) per
+    target. An mp3 target takes the audio of an mp4 source. ``filenames``
+    names the outputs, one per target; by default ``target_filename``.
+    Returns the filenames. The workspace is removed afterwards, as in
+    ``transcode_source``.
+    """
+    try:
+        with stage(token, "encode") as encode_token:
+            return _transcode_targets(source, targets, progress, encode_token, filenames)
+    finally:
+        with span("cleanup", source["url"]):
+            source["workspace"].cleanup()
+
+
+def _transcode_targets(source, targets, progress, token, filenames):
+    title = os.path.splitext(source["filename"])[0]
+    downloaded_path = source["downloaded_path"]
+    if filenames is None:
+        filenames = [target_filename(title, fmt, quality, targets) for fmt, quality in targets]
+    source_input = ffmpeg.input(downloaded_path)
+    renditions = []
+    for (fmt, quality), filename in zip(targets, filenames):
+        if fmt == "mp3":
+            kind, output_kwargs, stream = "mp3", _mp3_output_kwargs(quality), source_input.audio
+        else:
+            kind, output_kwargs = _mp4_output(downloaded_path, quality)
+            stream = source_input
+        rendition = {**source, "fmt": fmt, "filename": filename, "target_path": source["workspace"].file(filename)}
+        renditions.append((rendition, quality, kind, stream, output_kwargs))
+
+    kinds = [kind for _, _, kind, _, _ in renditions]
+    with scheduler.slot("multi", scheduler.combined_weight(kinds)) as slot:
+        with span("encode", source["url"], kind="multi", outputs=len(renditions), threads=slot.threads, queue_wait_s=round(slot.wait_time, 6)) as encode_span:
+            outputs = [
+                # Each encoder gets the threads its kind would have had on its own
+                ffmpeg.output(stream, rendition["target_path"], threads=min(slot.threads, scheduler.weights.get(kind, 1)), **output_kwargs)
+                for rendition, _, kind, stream, output_kwargs in renditions
+            ]
+            try:
+                _run_ffmpeg(ffmpeg.merge_outputs(*outputs), progress, token)
+            except ffmpeg.Error as fe:
+                err = fe.stderr.decode('utf-8', errors='ignore')
+                logger.error("FFmpeg multi-output error", extra={"error": err})
+                raise Exception(f"ffmpeg error: {err}")
+            encode_span["bytes"] = sum(_file_size(rendition["target_path"]) or 0 for rendition, *_ in renditions)
+    filenames = [_finish_output(rendition, quality) for rendition, quality, *_ in renditions]
+    logger.info("Multi-output conversion complete", extra={"filenames": filenames, "base_dir": source["base_dir"]})
+    return filenames
+
+
+def stream_convert(url, fmt, quality, target_dir=None, progress=None, token=None):
+    """Convert ``url`` by piping the download straight into ffmpeg, with no temp file.
+
+    Returns the filename, or None when the selected source can't be streamed
+    or is in the source cache (the caller should then use the temp-file path).
+    """
+    # mp4 sources are separate video+audio downloads that need a seekable merge
+    if fmt != "mp3":
+        return None
+    base_dir = target_dir if target_dir else get_media_dir()
+    if not os.path.exists(base_dir):
+        os.makedirs(base_dir, exist_ok=True)
+    existing = find_in_library(url, fmt, quality, base_dir)
+    if existing:
+        return existing
+    video_id = extract_video_id(url)
+    if source_cache.enabled and source_cache.lookup(video_id, accept=lambda cached: covers(cached["fmt"], cached["quality"], cached["max_height"], fmt, quality)):
+        # Converting the cached copy beats streaming it again
+        logger.info("Source cached, not streaming", extra={"video_id": video_id})
+        return None
+    info, _ = extract_info_cached(url, video_id, token=token)
+    with yt_dlp.YoutubeDL({"quiet": True, "format": "bestaudio/best", "simulate": True}) as ydl:
+        selected = ydl.process_ie_result(narrow_info(info, select_source(info, fmt, quality)), download=False)
+    if not is_streamable(selected):
+        logger.info("Source not streamable, using temp file", extra={"ext": selected.get("ext"), "protocol": selected.get("protocol")})
+        return None
+    filename = f"{sanitize_filename(info.get('title', 'downloaded_file'))}.{fmt}"
+    workspace = Workspace.create()
+    target_path = workspace.file(filename)
+    try:
+        with stage(token, "stream") as stream_token:
+            limiter.acquire(host_key(url), stream_token)
+            with scheduler.slot("mp3") as slot, span("stream", url, threads=slot.threads, queue_wait_s=round(slot.wait_time, 6)) as stream_span:
+                output = ffmpeg.input("pipe:").audio.output(target_path, audio_bitrate=f"{quality}k" if quality else "320k", format="mp3", acodec="libmp3lame", threads=slot.threads)
+                stream_span["bytes"] = stream_into_ffmpeg(selected["url"], selected.get("http_headers"), output, on_progress=progress, token=stream_token)
+        with span("publish", url):
+            filename = _publish(workspace, target_path, base_dir, filename, video_id or info.get("id"))
+    finally:
+        workspace.cleanup()
+    with span("metadata", url):
+        write_metadata(filename, base_dir)
+    _record_in_library({"video_id": video_id or info.get("id"), "fmt": fmt, "base_dir": base_dir, "filename": filename}, quality)
+    logger.info("MP3 stream conversion complete", extra={"target_path": os.path.join(base_dir, filename)})
+    return filename
+
+
+def plan_source(url, fmt, quality=None):
+    """What ``fetch_source`` would download for ``url``, without downloading it.
+
+    Returns the selected format ID, estimated bytes, height, bitrate and
+    whether an mp4 can be stream copied. ``format_id`` is None when the
+    formats lack the metadata to choose and yt-dlp would pick.
+    """
+    info, _ = extract_info_cached(url, extract_video_id(url))
+    selection = select_source(info, fmt, quality)
+    planned = selection.describe() if selection else {"format_id": None, "estimated_bytes": None}
+    return {"url": url, "title": info.get("title"), "fmt": fmt, "quality": quality, **planned}
+
+
+def download_and_convert(url, fmt, quality, target_dir=None, stream=False, progress=None, connections=DEFAULT_CONNECTIONS, token=None):
+    logger.info("Starting download and convert", extra={"url": url, "fmt": fmt, "quality": quality, "stream": stream})
+    try:
+        if stream:
+            filename = stream_convert(url, fmt, quality, target_dir, progress, token)
+            if filename is not None:
+                return filename
+        source = fetch_source(url, fmt, target_dir, quality, progress, connections, token=token)
+        return transcode_source(source, quality, progress, token)
+    except Cancelled:
+        logger.info("Download/convert cancelled", extra={"url": url})
+        raise
+    except Exception as e:
+        logger.error("Download/convert failed", extra={"error": str(e)})
+        raise Exception(f"Download/convert error: {e}")
+
+
+def download_and_convert_targets(url, targets, target_dir=None, progress=None, connections=DEFAULT_CONNECTIONS, token=None):
+    """Convert ``url`` to several ``(fmt, quality)`` renditions from one download and one ffmpeg run.
+
+    Returns one filename per entry of ``targets``, in order. Renditions
+    already in the library are not made again, and nothing is downloaded if
+    all of them are. An mp4 source is fetched when any missing target is an
+    mp4; the mp3 targets then use its audio.
+    """
+    targets = [(fmt, quality or None) for fmt, quality in targets]
+    if not targets or any(fmt not in ("mp3", "mp4") for fmt, _ in targets):
+        raise ValueError("Invalid format")
+    logger.info("Starting multi-target convert", extra={"url": url, "targets": targets})
+    base_dir = target_dir if target_dir else get_media_dir()
+    unique = list(dict.fromkeys(targets))
+    filenames = {target: find_in_library(url, *target, base_dir) for target in unique}
+    missing = [target for target in unique if not filenames[target]]
+    try:
+        if missing:
+            source_fmt = "mp4" if any(fmt == "mp4" for fmt, _ in missing) else "mp3"
+            # The source has to satisfy the most demanding target of its format; no bitrate means the best
+            qualities = [quality for fmt, quality in missing if fmt == source_fmt]
+            source_quality = None if None in qualities else max(qualities)
+            source = fetch_source(
+                url, source_fmt, base_dir, source_quality, progress, connections, token=token, check_library=False,
+            )
+            title = os.path.splitext(source["filename"])[0]
+            # Named against the whole request, so a rerun that only makes some targets names them the same
+            names = [target_filename(title, fmt, quality, unique) for fmt, quality in missing]
+            for target, filename in zip(missing, transcode_targets(source, missing, progress, token, names)):
+                filenames[target] = filename
+    except Cancelled:
+        logger.info("Multi-target convert cancelled", extra={"url": url})
+        raise
     except Exception as e:
-            logger.error("Download/convert failed", extra={"error": str(e)})
-            raise Exception(f"Download/convert error: {e}")
+        logger.error("Multi-target convert failed", extra={"error": str(e)})
+        raise Exception(f"Download/convert error: {e}")
+    return [filenames[target] for target in targets]
+
+
+def _entry_url(entry):
+    """Watch URL for a flat playlist entry; entries from non-YouTube extractors keep their own URL."""
+    if not entry:
+        return None
+    if entry.get("ie_key") not in (None, "Youtube") and entry.get("url"):
+        return entry["url"]
+    if "id" in entry:
+        return f"https://www.youtube.com/watch?v={entry['id']}"
+    return entry.get("url")
 
 
-def download_playlist(url, fmt, quality, target_dir=None):
-    logger.info("Starting playlist download", extra={"url": url, "fmt": fmt, "quality": quality})
+def _open_playlist(ydl, url, token=None):
+    """Resolve ``url`` to its playlist info without listing the entries.
+
+    Returns ``(info, entry_urls)``. ``entry_urls`` is a lazy iterator and
+    fetches further pages only as it is consumed. Cancelling ``token`` ends
+    a wait for the rate limiter.
+    """
+    info = limiter.call(url, lambda: ydl.extract_info(url, download=False, process=False), token=token)
+    # Some URLs (e.g. a channel) first resolve to another URL, such as its uploads tab
+    for _ in range(MAX_PLAYLIST_REDIRECTS):
+        if info.get("_type") not in ("url", "url_transparent"):
+            break
+        next_url, ie_key = info["url"], info.get("ie_key")
+        info = limiter.call(next_url, lambda: ydl.extract_info(next_url, download=False, process=False, ie_key=ie_key), token=token)
+
+    def _urls():
+        if info.get("entries") is None:
+            return
+        for _, entry in yt_dlp.utils.PlaylistEntries(ydl, info).get_requested_items():
+            entry_url = _entry_url(entry)
+            if entry_url:
+                yield entry_url
+
+    return info, _urls()
+
+
+def download_playlist(
+    url,
+    fmt,
+    quality,
+    target_dir=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    transcode_workers=DEFAULT_TRANSCODE_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    job_id=None,
+    progress=None,
+    on_item=None,
+    connections=DEFAULT_CONNECTIONS,
+    token=None,
+):
+    """Download every entry of a playlist into a folder named after it.
+
+    Entries are listed lazily. The first download starts as soon as the first
+    page of the listing arrives, and later pages are fetched as workers free
+    up. The listing is never held in memory as a whole.
+    """
+    logger.info("Starting playlist download", extra={"url": url, "fmt": fmt, "quality": quality, "max_workers": max_workers, "job_id": job_id})
+    job = load_job(job_id) if job_id else None
+    if job and job["items"] and job["enumerated"]:
+        # Resuming: the entries and playlist folder were journaled on the first run
+        logger.info("Resuming playlist job", extra={"job_id": job_id, "pending": len(pending_indexes(job))})
+        urls = [item["url"] for item in job["items"]]
+        return _download_items(
+            urls, fmt, quality, job["target_dir"], max_workers, transcode_workers, queue_size, job_id, progress, on_item,
+            connections=connections, token=token,
+        )
+    # Entries journaled before a crash keep their index; listing resumes after them
+    known = job["items"] if job else []
+
     ydl_opts = {
         "extract_flat": True,
         "quiet": True,
-        "ignoreerrors": True,
+        # Skip unavailable entries, but let a 429 on the listing itself reach the rate limiter
+        "ignoreerrors": "only_download",
+        "lazy_playlist": True,
     }
-    video_urls = []
-    playlist_title = "playlist"
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            playlist_title = info.get("title", playlist_title)
-            if "entries" in info:
-                for entry in info["entries"]:
-                    if entry and "id" in entry:
-                        video_urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
-        logger.info("Playlist entries fetched", extra={"count": len(video_urls)})
-    except Exception as e:
-        # update_job_progress(job_id, 100, results=[{"error": f"Failed to extract playlist: {e}"}])
-        print(f"Failed to extract playlist: {e}")
-        logger.error("Failed to extract playlist", extra={"error": str(e)})
-        return
-
-    playlist_safe = sanitize_filename(playlist_title)
-    base_dir = target_dir if target_dir else MEDIA_DIR
-    playlist_dir = os.path.join(base_dir, playlist_safe)
-    if not os.path.exists(playlist_dir):
-        os.makedirs(playlist_dir, exist_ok=True)
-
-    results = []
-    total = len(video_urls)
-    for idx, vurl in enumerate(video_urls):
+    # The entry iterator pages through this YoutubeDL, so it stays open for the whole run
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
-            file_id = download_and_convert(vurl, fmt, quality, target_dir=playlist_dir)
-            results.append({"url": vurl, "file_id": file_id, "status": "success"})
+            info, entry_urls = _open_playlist(ydl, url, token)
+        except Cancelled:
+            # Nothing ran yet; the journal stays so the job can be resumed
+            logger.info("Job cancelled", extra={"job_id": job_id, "completed": 0})
+            return []
         except Exception as e:
-            results.append({"url": vurl, "error": str(e), "status": "failed"})
-            logger.error("Item failed", extra={"url": vurl, "error": str(e)})
-        progress = int(((idx + 1) / total) * 100) if total else 100
-        logger.info("Playlist progress", extra={"progress": progress, "completed": idx + 1, "total": total})
-    return results
-        # update_job_progress(job_id, progress, results=results)
-    # update_job_progress(job_id, 100, results=results)
-
-
-def download_batch(urls, fmt, quality, job_id):
-    results = []
-    total = len(urls)
-    for idx, url in enumerate(urls):
+            print(f"Failed to extract playlist: {e}")
+            logger.error("Failed to extract playlist", extra={"error": str(e)})
+            if job_id:
+                finish_job(job_id)
+            return
+
+        playlist_title = info.get("title") or "playlist"
+        # The folder is journaled before the first entry; reuse it rather than nest a new one inside
+        if job and job["items_dir"]:
+            playlist_dir = job["items_dir"]
+        else:
+            base_dir = target_dir if target_dir else get_media_dir()
+            playlist_dir = os.path.join(base_dir, sanitize_filename(playlist_title))
+        if not os.path.exists(playlist_dir):
+            os.makedirs(playlist_dir, exist_ok=True)
+        if job_id and not (job and job["items_dir"]):
+            add_items(job_id, [], target_dir=playlist_dir, partial=True)
+        logger.info("Playlist opened", extra={"title": playlist_title, "count": info.get("playlist_count")})
+
+        def _entries():
+            index = 0
+            try:
+                for entry_url in entry_urls:
+                    if index < len(known):
+                        entry_url = known[index]["url"]
+                    elif job_id:
+                        add_items(job_id, [entry_url], partial=True)
+                    yield index, entry_url
+                    index += 1
+            except Exception as e:
+                # Keep what was listed; a resumed job picks the listing up again
+                logger.error("Playlist listing stopped early", extra={"error": str(e), "listed": index})
+                return
+            logger.info("Playlist entries listed", extra={"count": index})
+            if job_id:
+                mark_enumerated(job_id)
+
+        return _download_items(
+            _entries(), fmt, quality, playlist_dir, max_workers, transcode_workers, queue_size, job_id, progress, on_item,
+            total=info.get("playlist_count"), connections=connections, token=token,
+        )
+
+
+def _download_items(
+    items,
+    fmt,
+    quality,
+    target_dir,
+    max_workers,
+    transcode_workers,
+    queue_size,
+    job_id=None,
+    progress=None,
+    on_item=None,
+    total=None,
+    connections=DEFAULT_CONNECTIONS,
+    token=None,
+):
+    """Download items through the download -> transcode pipeline; results keep input order.
+
+    ``items`` is a list of URLs, or an iterator of ``(index, url)`` pairs that
+    the download workers pull lazily. For an iterator, ``total`` is the
+    expected count, or None if it is unknown. With a ``job_id`` every item's
+    state is journaled, and items the journal already has as done are not run
+    again. ``on_item(index, result)`` is called as each item completes.
+
+    Cancelling ``token`` stops new items from starting and stops the running
+    ones. Their results have status "cancelled", and a journaled job is left
+    unfinished so it can be resumed.
+    """
+    streamed = not isinstance(items, list)
+    if not streamed:
+        total = len(items)
+        items = enumerate(items)
+    results = {}
+    if job_id:
+        job = load_job(job_id)
+        if job and (streamed or len(job["items"]) == total):
+            for idx, item in enumerate(job["items"]):
+                if item["status"] == DONE:
+                    results[idx] = item["result"]
+    completed = len(results)
+    listed = 0
+    # Pipeline position -> item index, filled as the pipeline pulls items
+    order = []
+    started_at = time.time()
+    # Warm YoutubeDL instances per download worker, kept for the whole job
+    sessions = SessionPool()
+
+    def _pending_urls():
+        nonlocal listed
+        for idx, url in items:
+            if token and token.cancelled:
+                return
+            listed = idx + 1
+            if idx in results:
+                continue
+            order.append(idx)
+            yield url
+
+    def _on_start(idx):
+        if job_id:
+            mark_item(job_id, order[idx], RUNNING)
+
+    def _on_result(idx, result):
+        nonlocal completed
+        if result["status"] == "cancelled":
+            if job_id:
+                # Not a failure: a resumed job runs it again
+                mark_item(job_id, order[idx], QUEUED)
+            if on_item:
+                on_item(order[idx], result)
+            return
+        completed += 1
+        expected = max(total or 0, listed)
+        percent = int((completed / expected) * 100) if expected else 100
+        logger.info("Playlist progress", extra={"progress": percent, "completed": completed, "total": total})
+        if job_id:
+            mark_item(job_id, order[idx], DONE if result["status"] == "success" else FAILED, result)
+            update_job_progress(job_id, percent)
+        if on_item:
+            on_item(order[idx], result)
+
+    try:
+        pending_results = run_pipeline(
+            _pending_urls(),
+            lambda idx, url: fetch_source(url, fmt, target_dir, quality, for_item(progress, order[idx], total), connections, sessions, token),
+            lambda idx, source: transcode_source(source, quality, for_item(progress, order[idx], total), token),
+            download_workers=max_workers,
+            transcode_workers=transcode_workers,
+            queue_size=queue_size,
+            on_result=_on_result,
+            on_start=_on_start,
+        )
+    finally:
+        sessions.close()
+    for idx, result in zip(order, pending_results):
+        results[idx] = result
+    if token and token.cancelled:
+        logger.info("Job cancelled", extra={"job_id": job_id, "completed": completed})
+    elif job_id:
+        update_job_progress(job_id, 100)
+        finish_job(job_id)
+    logger.info("Info cache stats", extra=info_cache.stats())
+    logger.info("Transcode scheduler stats", extra={"stats": scheduler.stats()})
+    logger.info("Rate limiter stats", extra={"stats": limiter.stats()})
+    logger.info("YoutubeDL session stats", extra={"stats": sessions.stats()})
+    if source_cache.enabled:
+        logger.info("Source cache stats", extra={"stats": source_cache.stats()})
+    logger.info("Job metrics\n%s", recorder.format_summary(since=started_at))
+    return [results[idx] for idx in sorted(results)]
+
+
+def download_batch(
+    urls,
+    fmt,
+    quality,
+    job_id=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    transcode_workers=DEFAULT_TRANSCODE_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    target_dir=None,
+    progress=None,
+    on_item=None,
+    connections=DEFAULT_CONNECTIONS,
+    token=None,
+):
+    """Download many URLs concurrently; duplicates of the same video are dropped before any network call.
+
+    Returns one result per unique video, in first-seen order.
+    """
+    unique = dedupe_urls(urls)
+    logger.info("Starting batch download", extra={"count": len(unique), "duplicates": len(urls) - len(unique), "job_id": job_id})
+    if job_id:
+        job = load_job(job_id)
+        if job is not None and not job["items"]:
+            add_items(job_id, unique)
+    return _download_items(
+        unique, fmt, quality, target_dir, max_workers, transcode_workers, queue_size, job_id, progress, on_item,
+        connections=connections, token=token,
+    )
+
+
+def iter_download_batch(urls, fmt, quality, job_id=None, **options):
+    """Like ``download_batch``, but yields ``(index, result)`` as each item completes instead of one list at the end."""
+    completed = queue.Queue()
+    errors = []
+
+    def _run():
         try:
-            file_id = download_and_convert(url, fmt, quality)
-            results.append({"url": url, "file_id": file_id, "status": "success"})
+            download_batch(urls, fmt, quality, job_id, on_item=lambda idx, result: completed.put((idx, result)), **options)
         except Exception as e:
-            results.append({"url": url, "error": str(e), "status": "failed"})
-        progress = int(((idx + 1) / total) * 100) if total else 100
-        # update_job_progress(job_id, progress, results=results)
-    # update_job_progress(job_id, 100, results=results)
+            errors.append(e)
+        finally:
+            completed.put(None)
+
+    threading.Thread(target=_run, name="batch", daemon=True).start()
+    while True:
+        entry = completed.get()
+        if entry is None:
+            break
+        yield entry
+    if errors:
+        raise errors[0]
+
+
+def resume_job(
+    job_id,
+    max_workers=DEFAULT_MAX_WORKERS,
+    transcode_workers=DEFAULT_TRANSCODE_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    progress=None,
+    on_item=None,
+    connections=DEFAULT_CONNECTIONS,
+    token=None,
+):
+    """Continue a journaled playlist or batch job from its first unfinished item."""
+    job = load_job(job_id)
+    if job is None:
+        raise ValueError(f"Unknown job: {job_id}")
+    if job["kind"] == "playlist":
+        return download_playlist(
+            job["source_url"], job["fmt"], job["quality"], target_dir=job["target_dir"],
+            max_workers=max_workers, transcode_workers=transcode_workers, queue_size=queue_size, job_id=job_id, progress=progress,
+            on_item=on_item, connections=connections, token=token,
+        )
+    return download_batch(
+        [item["url"] for item in job["items"]], job["fmt"], job["quality"], job_id,
+        max_workers=max_workers, transcode_workers=transcode_workers, queue_size=queue_size, target_dir=job["target_dir"], progress=progress,
+        on_item=on_item, connections=connections, token=token,
+    )
+
 
 if __name__ == "__main__":
-    # Example usage
-    test_url = "https://www.youtube.com/watch?v=DxsDekHDKXo"
-    try:
-        file_id = download_and_convert(test_url, "mp3", 320)
-        print(f"Downloaded and converted file ID: {file_id}")
-    except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+    # The command-line interface lives in cli.py; ``python downloader.py URL`` is kept as a shortcut
+    from cli import main
+
+    raise SystemExit(main())
@@ -1,11 +1,33 @@
 import os
+import sys
 import uuid
 from pathlib import Path
 
+from config import APP_DATA_DIR_NAME
+
 ICON_PATH = "logo.png"
 ICO_ICON_PATH = "icon.ico"
 OUTPUT_DIR_FILE = "output_dir.txt"
-DEFAULT_OUTPUT_DIR = Path.cwd() / "output"
+
+
+def app_data_path(name) -> Path:
+    """Where state that must outlive the process (journals, caches) is kept.
+
+    Next to the code when run from source. A frozen build's code lives in a
+    temporary extraction folder that is removed on exit, so it uses a
+    per-user data folder instead (``%LOCALAPPDATA%`` or ``$XDG_DATA_HOME``,
+    else ``~/.local/share``).
+    """
+    if not getattr(sys, "frozen", False):
+        return Path(__file__).with_name(name)
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    root = Path(base) / APP_DATA_DIR_NAME
+    root.mkdir(parents=True, exist_ok=True)
+    return root / name
+
+
+def _default_output_dir() -> Path:
+    return Path.cwd() / "output"
 
 
 def _load_output_dir() -> Path:
@@ -20,16 +42,36 @@ def _load_output_dir() -> Path:
                     return candidate
         except OSError:
             pass
-    return DEFAULT_OUTPUT_DIR
+    return _default_output_dir()
+
+
+_media_dir = None
+
+
+def get_media_dir() -> str:
+    """Default output folder, resolved from output_dir.txt on first use rather than at import."""
+    global _media_dir
+    if _media_dir is None:
+        _media_dir = str(_load_output_dir())
+    return _media_dir
+
+
+def __getattr__(name):
+    # Keeps ``file_utils.MEDIA_DIR`` working without computing it at import time
+    if name == "MEDIA_DIR":
+        return get_media_dir()
+    if name == "DEFAULT_OUTPUT_DIR":
+        return _default_output_dir()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-MEDIA_DIR = str(_load_output_dir())
 METADATA_EXT = ".metadata.json"
 
 
 def ensure_media_dir():
-    if not os.path.exists(MEDIA_DIR):
-        os.makedirs(MEDIA_DIR)
+    media_dir = get_media_dir()
+    if not os.path.exists(media_dir):
+        os.makedirs(media_dir)
 
 
 def generate_uuid_filename(ext):
@@ -37,7 +79,7 @@ def generate_uuid_filename(ext):
 
 
 def get_media_path(file_id):
-    return os.path.join(MEDIA_DIR, file_id)
+    return os.path.join(get_media_dir(), file_id)
 
 
 def cleanup_file(filepath):
@@ -0,0 +1,210 @@
+"""
+Source format selection sized to the output.
+
+yt-dlp's "bestvideo+bestaudio/best" fetches the biggest streams on offer,
+whatever the output needs. A 1000 kbps mp4 could pull a 4K source and then
+spend most of its encode scaling it down. ``select_source`` looks at the
+formats of an info dict and picks the smallest source that still satisfies
+the target:
+
+  * mp3: the smallest audio-only stream whose bitrate reaches the target
+    bitrate (320 kbps when unset), or the best one if none does.
+  * mp4 with a bitrate: the smallest video stream whose bitrate reaches it,
+    plus the best audio. The output is re-encoded anyway.
+  * mp4 without a bitrate: the highest resolution, preferring H.264 + AAC,
+    which can be stream copied instead of re-encoded.
+
+``set_max_height`` caps the resolution of mp4 sources. When the formats
+don't carry enough metadata to decide, ``select_source`` returns None and
+yt-dlp's own selection applies.
+"""
+import threading
+
+# Bitrate libmp3lame is given when no quality is requested
+MP3_DEFAULT_KBPS = 320
+# Codecs an mp4 can take as-is (prefixes of yt-dlp's vcodec/acodec strings)
+COPY_VIDEO_CODECS = ("avc1", "h264")
+COPY_AUDIO_CODECS = ("mp4a", "aac")
+
+_max_height = None
+_lock = threading.Lock()
+
+
+def set_max_height(height):
+    """Never pick an mp4 source taller than ``height`` pixels when a lower one exists (None removes the cap)."""
+    global _max_height
+    with _lock:
+        _max_height = height or None
+
+
+def max_height():
+    with _lock:
+        return _max_height
+
+
+class Selection:
+    """The format(s) chosen for one item: one muxed or audio-only format, or a video + audio pair."""
+
+    def __init__(self, formats, duration=None, stream_copy=False):
+        self.formats = formats
+        self.format_id = "+".join(str(f["format_id"]) for f in formats)
+        self.stream_copy = stream_copy
+        sizes = [_estimated_bytes(f, duration) for f in formats]
+        self.estimated_bytes = sum(sizes) if None not in sizes else None
+        self.height = next((f.get("height") for f in formats if _has_video(f)), None)
+
+    def describe(self):
+        return {
+            "format_id": self.format_id,
+            "estimated_bytes": self.estimated_bytes,
+            "height": self.height,
+            "kbps": round(sum(_total_kbps(f) or 0 for f in self.formats)) or None,
+            "stream_copy": self.stream_copy,
+        }
+
+
+def _has_video(f):
+    return f.get("vcodec") not in (None, "none")
+
+
+def _has_audio(f):
+    return f.get("acodec") not in (None, "none")
+
+
+def _is_audio_only(f):
+    return f.get("vcodec") == "none" and _has_audio(f)
+
+
+def _is_video_only(f):
+    return _has_video(f) and f.get("acodec") == "none"
+
+
+def _usable(f):
+    # Storyboards are image strips, and DRM streams can't be decoded
+    return f.get("format_id") is not None and f.get("protocol") != "mhtml" and not f.get("has_drm")
+
+
+def _audio_kbps(f):
+    return f.get("abr") or (f.get("tbr") if _is_audio_only(f) else None)
+
+
+def _video_kbps(f):
+    if f.get("vbr"):
+        return f["vbr"]
+    if f.get("tbr"):
+        return f["tbr"] - (f.get("abr") or 0) if _has_audio(f) else f["tbr"]
+    return None
+
+
+def _total_kbps(f):
+    return f.get("tbr") or ((f.get("vbr") or 0) + (f.get("abr") or 0)) or None
+
+
+def _estimated_bytes(f, duration):
+    size = f.get("filesize") or f.get("filesize_approx")
+    if size:
+        return int(size)
+    kbps = _total_kbps(f)
+    return int(kbps * 1000 / 8 * duration) if kbps and duration else None
+
+
+def _codec_is(codec, prefixes):
+    return (codec or "").lower().startswith(prefixes)
+
+
+def _smallest_reaching(candidates, kbps_of, target):
+    """The lowest-bitrate candidate at or above ``target``, else the highest; None if none has a bitrate."""
+    rated = [c for c in candidates if kbps_of(c)]
+    if not rated:
+        return None
+    enough = [c for c in rated if kbps_of(c) >= target]
+    return min(enough, key=kbps_of) if enough else max(rated, key=kbps_of)
+
+
+def _best_audio(audio, prefer_copy=False):
+    rated = [f for f in audio if _audio_kbps(f)]
+    if not rated:
+        return None
+    return max(rated, key=lambda f: (prefer_copy and _codec_is(f.get("acodec"), COPY_AUDIO_CODECS), _audio_kbps(f)))
+
+
+def _select_mp3(formats, quality, duration):
+    audio = [f for f in formats if _is_audio_only(f)]
+    chosen = _smallest_reaching(audio, _audio_kbps, quality or MP3_DEFAULT_KBPS)
+    return Selection([chosen], duration) if chosen else None
+
+
+def _select_mp4(formats, quality, duration, height_cap):
+    audio = [f for f in formats if _is_audio_only(f)]
+    # A candidate is one muxed format, or a video-only format to pair with an audio stream
+    videos = [f for f in formats if _has_video(f) and (_has_audio(f) or (_is_video_only(f) and audio))]
+    if height_cap:
+        capped = [f for f in videos if f.get("height") and f["height"] <= height_cap]
+        if not capped:
+            lowest = min((f.get("height") for f in videos if f.get("height")), default=None)
+            capped = [f for f in videos if f.get("height") == lowest]
+        videos = capped
+    if not videos:
+        return None
+    copy_audio = [f for f in audio if _codec_is(f.get("acodec"), COPY_AUDIO_CODECS)]
+
+    def _can_copy(f):
+        if not _codec_is(f.get("vcodec"), COPY_VIDEO_CODECS):
+            return False
+        return _codec_is(f.get("acodec"), COPY_AUDIO_CODECS) if _has_audio(f) else bool(copy_audio)
+
+    if quality:
+        # Re-encoded to ``quality`` whatever the source, so only the size matters
+        video = _smallest_reaching(videos, _video_kbps, quality)
+        stream_copy = False
+    else:
+        tallest = max(f.get("height") or 0 for f in videos)
+        top = [f for f in videos if (f.get("height") or 0) == tallest]
+        video = max(top, key=lambda f: (_can_copy(f), _video_kbps(f) or 0))
+        stream_copy = _can_copy(video)
+    if video is None:
+        return None
+    if _has_audio(video):
+        return Selection([video], duration, stream_copy)
+    # Audio is a small share of an mp4's bytes; keep the best (it may also feed mp3 renditions)
+    best_audio = _best_audio(copy_audio if stream_copy else audio, prefer_copy=True)
+    if best_audio is None:
+        return None
+    return Selection([video, best_audio], duration, stream_copy)
+
+
+def select_source(info, fmt, quality=None):
+    """The Selection to download for an ``fmt`` output at ``quality`` kbps, or None to leave it to yt-dlp."""
+    formats = [f for f in info.get("formats") or [] if _usable(f)]
+    if not formats:
+        return None
+    if fmt == "mp3":
+        return _select_mp3(formats, quality, info.get("duration"))
+    return _select_mp4(formats, quality, info.get("duration"), max_height())
+
+
+def covers(fetched_fmt, fetched_quality, fetched_max_height, fmt, quality=None, height_cap=None):
+    """Whether a source selected for one target is good enough for another, judged by the targets alone.
+
+    For when the formats aren't at hand (e.g. a cached source after the
+    info dict expired). An mp4 source always carries the best audio, so it
+    covers any mp3. Otherwise the source must have been picked for the same
+    format with no bitrate, or at least the wanted one, and under no lower
+    height cap.
+    """
+    if fmt == "mp3":
+        if fetched_fmt == "mp4":
+            return True
+        return fetched_fmt == "mp3" and (fetched_quality or MP3_DEFAULT_KBPS) >= (quality or MP3_DEFAULT_KBPS)
+    if fetched_fmt != "mp4":
+        return False
+    if fetched_quality and (not quality or fetched_quality < quality):
+        return False
+    return not fetched_max_height or bool(height_cap and fetched_max_height >= height_cap)
+
+
+def narrow_info(info, selection):
+    """A copy of ``info`` offering only the selected formats, so yt-dlp's own selector picks exactly them."""
+    if selection is None:
+        return info
+    return {**info, "formats": selection.formats}
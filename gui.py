@@ -5,10 +5,12 @@ Built with PySide6. No download/conversion functionality is wired yet.
 from pathlib import Path
 import logging
 import sys
+import threading
 
-from PySide6.QtCore import Qt, QTimer, QThread, Signal, QRectF
-from PySide6.QtGui import QIcon, QPainter, QPen, QColor, QConicalGradient
+from PySide6.QtCore import Qt, QElapsedTimer, QEvent, QTimer, QThread, Signal, QRectF
+from PySide6.QtGui import QIcon, QPainter, QPen, QColor, QConicalGradient, QPixmap
 from PySide6.QtWidgets import (
+    QAbstractItemView,
     QApplication,
     QButtonGroup,
     QComboBox,
@@ -17,9 +19,12 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QListWidget,
+    QListWidgetItem,
     QMainWindow,
     QPushButton,
     QSpacerItem,
+    QSpinBox,
     QStackedLayout,
     QVBoxLayout,
     QWidget,
@@ -29,38 +34,110 @@ from PySide6.QtWidgets import (
 
 
 
+# The old 16 ms timer redrew 10 degrees a tick; 36 cached frames at 30 fps keep that speed
+SPINNER_FPS = 30
+SPINNER_FRAMES = 36
+SPINNER_DEGREES_PER_S = 600
+
+
 def resource_path(name):
     if hasattr(sys, "_MEIPASS"):
         return Path(sys._MEIPASS) / name
     return Path(__file__).parent / name
 class SpinnerWidget(QWidget):
 
-    """A custom spinning loader widget."""
-    
-    def __init__(self, parent=None, color=QColor(230, 80, 80), line_width=4):
+    """A custom spinning loader widget.
+
+    The rotation frames are rendered once, antialiased, into pixmaps shared
+    by every spinner of the same size and colour, so a tick only blits one
+    of them. The timer runs only while the spinner is on screen: it pauses
+    when the spinner or its window is hidden or minimized, and picks up
+    again when it comes back.
+    """
+
+    # (width, height, rgba, line width, device pixel ratio) -> rotation frames
+    _frame_cache = {}
+
+    def __init__(self, parent=None, color=QColor(230, 80, 80), line_width=4, fps=SPINNER_FPS):
         super().__init__(parent)
-        self._angle = 0
+        self._frame = 0
         self._color = color
         self._line_width = line_width
+        self._spinning = False
+        self._watched_window = None
+        self._clock = QElapsedTimer()
         self._timer = QTimer(self)
         self._timer.timeout.connect(self._rotate)
+        self.set_fps(fps)
         self.setFixedSize(40, 40)
         self.setAttribute(Qt.WA_TranslucentBackground)
-    
+
+    def set_fps(self, fps):
+        """Redraw at most ``fps`` times a second; the rotation speed stays the same."""
+        self._timer.setInterval(max(1, round(1000 / fps)))
+
     def _rotate(self):
-        self._angle = (self._angle + 10) % 360
-        self.update()
+        # Frame from elapsed time, so a lower fps or a late tick doesn't slow the spin
+        step = 360 / SPINNER_FRAMES
+        frame = int(self._clock.elapsed() / 1000 * SPINNER_DEGREES_PER_S / step) % SPINNER_FRAMES
+        if frame != self._frame:
+            self._frame = frame
+            self.update()
     
     def start(self):
-        self._timer.start(16)  # ~60 FPS
+        self._spinning = True
+        self._clock.start()
         self.show()
+        self._sync_timer()
     
     def stop(self):
+        self._spinning = False
         self._timer.stop()
         self.hide()
-    
-    def paintEvent(self, event):
-        painter = QPainter(self)
+
+    def _sync_timer(self):
+        on_screen = self.isVisible() and not self.window().isMinimized()
+        if self._spinning and on_screen:
+            if not self._timer.isActive():
+                self._timer.start()
+        else:
+            self._timer.stop()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        window = self.window()
+        if window is not self and window is not self._watched_window:
+            # Minimizing doesn't hide child widgets; watch the window's state instead
+            if self._watched_window is not None:
+                self._watched_window.removeEventFilter(self)
+            window.installEventFilter(self)
+            self._watched_window = window
+        self._sync_timer()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._sync_timer()
+
+    def eventFilter(self, obj, event):
+        if obj is self._watched_window and event.type() in (QEvent.WindowStateChange, QEvent.Hide, QEvent.Show):
+            self._sync_timer()
+        return False
+
+    def _frames(self):
+        ratio = self.devicePixelRatioF()
+        key = (self.width(), self.height(), self._color.rgba(), self._line_width, ratio)
+        frames = self._frame_cache.get(key)
+        if frames is None:
+            frames = self._frame_cache[key] = [
+                self._render_frame(index * 360 / SPINNER_FRAMES, ratio) for index in range(SPINNER_FRAMES)
+            ]
+        return frames
+
+    def _render_frame(self, angle, ratio):
+        pixmap = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
         
         # Calculate the drawing area
@@ -69,7 +146,7 @@ class SpinnerWidget(QWidget):
         rect = QRectF(margin, margin, side - 2 * margin, side - 2 * margin)
         
         # Create gradient for the arc
-        gradient = QConicalGradient(rect.center(), -self._angle)
+        gradient = QConicalGradient(rect.center(), -angle)
         gradient.setColorAt(0, self._color)
         gradient.setColorAt(0.7, QColor(self._color.red(), self._color.green(), self._color.blue(), 50))
         gradient.setColorAt(1, QColor(self._color.red(), self._color.green(), self._color.blue(), 0))
@@ -82,11 +159,23 @@ class SpinnerWidget(QWidget):
         painter.setPen(pen)
         
         # Draw arc (270 degrees visible)
-        start_angle = int(self._angle * 16)
+        start_angle = int(angle * 16)
         span_angle = 270 * 16
         painter.drawArc(rect, start_angle, span_angle)
+        painter.end()
+        return pixmap
 
-from downloader import download_and_convert, download_playlist
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._frames()[self._frame])
+
+from batch import dedupe_urls, read_url_file
+from downloader import download_and_convert, download_batch, download_playlist, resume_job, warm_up
+from job_manager import create_job, finish_job, unfinished_jobs
+from job_queue import CANCELLED, DONE, FAILED, MAX_RUNNING_LIMIT, QUEUED, RUNNING, JobQueue
+from log_utils import configure_logging
+from process_runner import Cancelled, CancelToken
+from progress import ProgressThrottle
 from config import ICON_PATH, ICO_ICON_PATH, OUTPUT_DIR_FILE
 
 
@@ -94,30 +183,105 @@ icon_path = Path(__file__).with_name(ICON_PATH)
 ico_icon_path = Path(__file__).with_name(ICO_ICON_PATH)
 output_dir_file = Path(__file__).with_name(OUTPUT_DIR_FILE)
 
+PROGRESS_MAX_RATE = 8  # progress signals per second
+STATE_LABELS = {QUEUED: "Queued", RUNNING: "Running", DONE: "Done", FAILED: "Failed", CANCELLED: "Cancelled"}
+MODE_LABELS = {"single video": "Video", "playlist": "Playlist", "batch file": "Batch", "resume": "Resume"}
+
 logger = logging.getLogger(__name__)
-if not logger.handlers:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+
+def _format_bytes(num) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num < 1024 or unit == "GB":
+            return f"{num:.1f} {unit}" if unit != "B" else f"{int(num)} B"
+        num /= 1024
+
+
+def format_progress(event: dict) -> str:
+    """One-line status text for a progress event."""
+    parts = []
+    if event.get("item_total"):
+        parts.append(f"Item {event['item_index'] + 1}/{event['item_total']}")
+    elif event.get("item_index") is not None:
+        # Streamed playlist whose length is not known yet
+        parts.append(f"Item {event['item_index'] + 1}")
+    if event.get("stage") == "download":
+        done = event.get("downloaded_bytes") or 0
+        total = event.get("total_bytes")
+        text = f"Downloading {_format_bytes(done)}" + (f" / {_format_bytes(total)}" if total else "")
+        if event.get("speed"):
+            text += f" at {_format_bytes(event['speed'])}/s"
+        parts.append(text)
+    elif event.get("stage") == "encode":
+        out_time = int(event.get("out_time") or 0)
+        text = f"Converting {out_time // 60:02d}:{out_time % 60:02d}"
+        if event.get("speed"):
+            text += f" ({event['speed']:.1f}x)"
+        parts.append(text)
+    return " · ".join(parts)
 
 
 class DownloadWorker(QThread):
     """Worker thread for downloading and converting videos."""
     finished = Signal(bool, str, str)  # success, result_message, video_name
+    progress = Signal(object)  # list of coalesced progress events, see progress.py
     
-    def __init__(self, mode: str, url: str, fmt: str, quality: int | None, output_dir: Path):
+    def __init__(self, mode: str, url: str, fmt: str, quality: int | None, output_dir: Path, job_id: str | None = None):
         super().__init__()
         self.mode = mode
         self.url = url
         self.fmt = fmt
         self.quality = quality
         self.output_dir = str(output_dir)
+        self.job_id = job_id
+        # At most PROGRESS_MAX_RATE signals/s reach the GUI thread however big the playlist is
+        self._throttle = ProgressThrottle(self.progress.emit, max_rate=PROGRESS_MAX_RATE)
+        self.token = CancelToken()
+
+    def cancel(self):
+        """Stop the job: kills running encodes and transfers; safe to call from the GUI thread."""
+        self.token.cancel()
+
+    def _cancelled_message(self, results):
+        saved = sum(1 for r in results if r.get("status") == "success")
+        return f"Download cancelled ({saved} saved)" if saved else "Download cancelled"
     
+    def _finish(self, success: bool, message: str, video_name: str):
+        # Deliver the last coalesced progress before the result so it can't overwrite it
+        self._throttle.flush()
+        self.finished.emit(success, message, video_name)
+
     def run(self):
         try:
             import os
             
-            if "playlist" in self.mode:
-                # Download playlist to a subfolder
-                results = download_playlist(self.url, self.fmt, self.quality, target_dir=self.output_dir)
+            if self.mode == "resume":
+                results = resume_job(self.job_id, progress=self._throttle, token=self.token) or []
+                if self.token.cancelled:
+                    self._finish(False, self._cancelled_message(results), "")
+                    return
+                failed = sum(1 for r in results if r.get("status") != "success")
+                self._finish(failed == 0, f"Resumed job finished ({len(results) - failed}/{len(results)} saved)", "")
+            elif self.mode == "batch file":
+                urls = dedupe_urls(read_url_file(self.url))
+                if self.job_id is None:
+                    self.job_id = create_job("batch", self.fmt, self.quality, target_dir=self.output_dir, urls=urls)
+                results = download_batch(urls, self.fmt, self.quality, self.job_id, target_dir=self.output_dir, progress=self._throttle, token=self.token)
+                if self.token.cancelled:
+                    self._finish(False, self._cancelled_message(results), "")
+                    return
+                saved = sum(1 for r in results if r.get("status") == "success")
+                self._finish(saved == len(results), f"{saved}/{len(results)} videos saved", "")
+            elif "playlist" in self.mode:
+                # Download playlist to a subfolder; journaled so it can resume after a crash
+                if self.job_id is None:
+                    self.job_id = create_job("playlist", self.fmt, self.quality, target_dir=self.output_dir, source_url=self.url)
+                results = download_playlist(
+                    self.url, self.fmt, self.quality, target_dir=self.output_dir, job_id=self.job_id, progress=self._throttle, token=self.token,
+                )
+                if self.token.cancelled:
+                    self._finish(False, self._cancelled_message(results or []), "")
+                    return
                 # Extract playlist name - it's saved in a subdirectory
                 playlist_name = "playlist"
                 if results and len(results) > 0:
@@ -127,13 +291,15 @@ class DownloadWorker(QThread):
                         # Get the newest directory
                         newest_dir = max([os.path.join(self.output_dir, d) for d in dirs], key=os.path.getmtime)
                         playlist_name = os.path.basename(newest_dir)
-                self.finished.emit(True, f'{playlist_name} is saved', playlist_name)
+                self._finish(True, f'{playlist_name} is saved', playlist_name)
             else:
-                filename = download_and_convert(self.url, self.fmt, self.quality, target_dir=self.output_dir)
-                self.finished.emit(True, f'{filename} is saved', filename)
+                filename = download_and_convert(self.url, self.fmt, self.quality, target_dir=self.output_dir, progress=self._throttle, token=self.token)
+                self._finish(True, f'{filename} is saved', filename)
+        except Cancelled:
+            self._finish(False, "Download cancelled", "")
         except Exception as e:
             logger.error("Download failed", extra={"error": str(e)})
-            self.finished.emit(False, "Failure, please try again later", "")
+            self._finish(False, "Failure, please try again later", "")
 
 
 class ConverterWindow(QMainWindow):
@@ -148,9 +314,12 @@ class ConverterWindow(QMainWindow):
         self.output_dir: Path | None = None
         self._load_output_dir()
         self._apply_theme()
+        self.queue = JobQueue()
+        # Queue job id -> its running DownloadWorker
+        self._workers = {}
+        # Jobs finished since the queue was last idle, for the summary toast
+        self._finished_batch = []
         self._build_ui()
-        self._init_spinner()
-        self.worker = None
         QTimer.singleShot(0, self._post_init)
     
     def _post_init(self):
@@ -158,15 +327,28 @@ class ConverterWindow(QMainWindow):
             self._prompt_initial_output_dir()
         else:
             self.output_path_edit.setText(str(self.output_dir))
-    
-    def _init_spinner(self):
-        """Initialize the waiting spinner for the convert button."""
-        self.spinner = SpinnerWidget(
-            parent=self,
-            color=QColor(255, 255, 255),  # White color for visibility on red button
-            line_width=4
+        self._offer_resume()
+
+    def _offer_resume(self) -> None:
+        """Offer to continue a playlist/batch job that was interrupted by a crash or restart."""
+        from PySide6.QtWidgets import QMessageBox
+
+        jobs = unfinished_jobs()
+        if not jobs:
+            return
+        job = jobs[-1]
+        remaining = sum(1 for item in job["items"] if item["status"] != "done")
+        answer = QMessageBox.question(
+            self,
+            "Resume download",
+            f"An unfinished {job['kind']} job has {remaining} item(s) left. Resume it?",
         )
-        self.spinner.hide()
+        if answer != QMessageBox.Yes:
+            for stale in jobs:
+                finish_job(stale["job_id"])
+            return
+        self.queue.submit("resume", job.get("source_url") or "", job["fmt"], job["quality"], self.output_dir, journal_id=job["job_id"])
+        self._pump()
 
     def _apply_theme(self) -> None:
         # Global stylesheet keeps the dark, red-accented theme consistent.
@@ -190,6 +372,16 @@ class ConverterWindow(QMainWindow):
             QPushButton#convert:hover { background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
                                                                     stop:0 #d33b3b, stop:1 #d3745b); }
             QPushButton#convert:pressed { background: #a92e2e; }
+            QPushButton#queueAction { background: #17171b; color: #d9dbe2; border: 1px solid #2b2b31;
+                                      border-radius: 8px; padding: 8px 14px; font-weight: 600; }
+            QPushButton#queueAction:hover { border-color: #e65050; color: #f5f5f7; }
+            QPushButton#queueAction:disabled { color: #6b6d75; }
+            QListWidget#queue { background: #0f0f13; color: #e9e9ef; border: 1px solid #2b2b31;
+                                border-radius: 8px; padding: 6px; font-size: 14px; }
+            QListWidget#queue::item { padding: 6px; }
+            QListWidget#queue::item:selected { background: #2d2a2f; color: #ffffff; }
+            QSpinBox { background: #0f0f13; color: #e9e9ef; border: 1px solid #2b2b31;
+                       border-radius: 6px; padding: 4px 8px; }
             QLineEdit, QComboBox { background: #0f0f13; color: #e9e9ef; border: 1px solid #2b2b31;
                                    border-radius: 8px; padding: 12px; font-size: 15px; }
             QComboBox::drop-down { border: none; width: 28px; }
@@ -212,7 +404,11 @@ class ConverterWindow(QMainWindow):
         root.addItem(QSpacerItem(0, 12))
         root.addLayout(self._mode_switcher())
         root.addItem(QSpacerItem(0, 4))
-        root.addWidget(self._form_card())
+        cards = QHBoxLayout()
+        cards.setSpacing(20)
+        cards.addWidget(self._form_card(), 1)
+        cards.addWidget(self._queue_card(), 1)
+        root.addLayout(cards)
         root.addItem(QSpacerItem(0, 8))
         root.addLayout(self._footer())
 
@@ -281,13 +477,14 @@ class ConverterWindow(QMainWindow):
         modes.setSpacing(10)
         modes.addStretch()
         self.mode_group = QButtonGroup(self)
-        for text in ["Single Video", "Playlist"]:
+        for text in ["Single Video", "Playlist", "Batch File"]:
             btn = QPushButton(text)
             btn.setCheckable(True)
             btn.setObjectName("mode")
             self.mode_group.addButton(btn)
             modes.addWidget(btn)
         self.mode_group.buttons()[0].setChecked(True)
+        self.mode_group.buttonClicked.connect(self._on_mode_changed)
         modes.addStretch()
         layout.addLayout(modes)
         return layout
@@ -309,7 +506,8 @@ class ConverterWindow(QMainWindow):
         output_row.addWidget(self.output_path_edit)
         output_row.addWidget(browse_btn)
 
-        url_label = QLabel("YouTube Video URL:")
+        self.url_label = QLabel("YouTube Video URL:")
+        url_label = self.url_label
         self.url_input = QLineEdit()
         self.url_input.setPlaceholderText("https://www.youtube.com/watch?v=...")
 
@@ -336,6 +534,63 @@ class ConverterWindow(QMainWindow):
         card_layout.addLayout(form_grid)
         return card
 
+    def _queue_card(self) -> QWidget:
+        card = QWidget()
+        card.setObjectName("card")
+        layout = QVBoxLayout(card)
+        layout.setContentsMargins(18, 18, 18, 18)
+        layout.setSpacing(10)
+
+        header = QHBoxLayout()
+        self.queue_label = QLabel("Queue")
+        header.addWidget(self.queue_label)
+        self.spinner = SpinnerWidget(parent=card, line_width=3)
+        self.spinner.setFixedSize(22, 22)
+        self.spinner.hide()
+        header.addWidget(self.spinner)
+        header.addStretch()
+        header.addWidget(QLabel("Run at once:"))
+        self.max_running_spin = QSpinBox()
+        self.max_running_spin.setRange(1, MAX_RUNNING_LIMIT)
+        self.max_running_spin.setValue(self.queue.max_running)
+        self.max_running_spin.valueChanged.connect(self._on_max_running_changed)
+        header.addWidget(self.max_running_spin)
+        layout.addLayout(header)
+
+        self.queue_list = QListWidget()
+        self.queue_list.setObjectName("queue")
+        self.queue_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.queue_list.itemSelectionChanged.connect(self._update_queue_actions)
+        layout.addWidget(self.queue_list)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        self.move_up_btn = QPushButton("Move Up")
+        self.move_up_btn.clicked.connect(lambda: self._move_selected(-1))
+        self.move_down_btn = QPushButton("Move Down")
+        self.move_down_btn.clicked.connect(lambda: self._move_selected(1))
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self._on_cancel_clicked)
+        self.clear_btn = QPushButton("Clear Finished")
+        self.clear_btn.clicked.connect(self._on_clear_finished)
+        for btn in (self.move_up_btn, self.move_down_btn, self.cancel_btn):
+            btn.setObjectName("queueAction")
+            actions.addWidget(btn)
+        actions.addStretch()
+        self.clear_btn.setObjectName("queueAction")
+        actions.addWidget(self.clear_btn)
+        layout.addLayout(actions)
+        self._refresh_queue()
+        return card
+
+    def _on_mode_changed(self, button) -> None:
+        if button.text() == "Batch File":
+            self.url_label.setText("URL list file (.txt or .csv):")
+            self.url_input.setPlaceholderText("Leave empty to browse for a file")
+        else:
+            self.url_label.setText("YouTube Video URL:")
+            self.url_input.setPlaceholderText("https://www.youtube.com/watch?v=...")
+
     def _choose_output_dir(self) -> None:
         selected = QFileDialog.getExistingDirectory(self, "Select Output Folder", str(self.output_dir))
         if selected:
@@ -384,6 +639,11 @@ class ConverterWindow(QMainWindow):
         layout.addWidget(self.convert_btn)
         layout.addSpacing(8)
 
+        self.status_label = QLabel("")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setObjectName("subtitle")
+        layout.addWidget(self.status_label)
+
         note = QLabel("Keep SmuggyConverter open during download to avoid interruptions")
         note.setAlignment(Qt.AlignCenter)
         note.setObjectName("subtitle")
@@ -391,13 +651,15 @@ class ConverterWindow(QMainWindow):
         return layout
 
     def _on_convert_clicked(self) -> None:
-        if self.worker and self.worker.isRunning():
-            return  # Prevent multiple simultaneous downloads
-        
         checked = self.mode_group.checkedButton()
         mode = checked.text().lower() if checked else "single"
         url = self.url_input.text().strip()
         
+        if mode == "batch file" and not url:
+            url, _ = QFileDialog.getOpenFileName(self, "Select a list of URLs", str(Path.home()), "URL lists (*.txt *.csv)")
+            if not url:
+                return
+            self.url_input.setText(url)
         if not url:
             self._show_toast("Please enter a YouTube URL", False)
             return
@@ -410,45 +672,147 @@ class ConverterWindow(QMainWindow):
         
         logger.info("Convert clicked", extra={"mode": mode, "url": url, "fmt": fmt, "quality": quality})
         
-        # Start spinner and disable button
-        self._start_loading()
-        
-        # Create and start worker thread
-        self.worker = DownloadWorker(mode, url, fmt, quality, self.output_dir)
-        self.worker.finished.connect(self._on_download_finished)
-        self.worker.start()
-    
-    def _start_loading(self):
-        """Show spinner in button and disable it."""
-        self.convert_btn.setText("")
-        self.convert_btn.setEnabled(False)
-        
-        # Position spinner in the center of the button
-        self.spinner.setParent(self.convert_btn)
-        button_rect = self.convert_btn.rect()
-        spinner_x = (button_rect.width() - self.spinner.width()) // 2
-        spinner_y = (button_rect.height() - self.spinner.height()) // 2
-        self.spinner.move(spinner_x, spinner_y)
-        self.spinner.start()
-    
-    def _stop_loading(self):
-        """Stop spinner and restore button."""
-        self.spinner.stop()
-        self.spinner.setParent(self)
-        self.spinner.hide()
-        self.convert_btn.setText(self.original_button_text)
-        self.convert_btn.setEnabled(True)
-    
-    def _on_download_finished(self, success: bool, message: str, video_name: str):
-        """Handle download completion."""
-        self._stop_loading()
-        self._show_toast(message, success)
-        
+        # Queue it and clear the field so the next link can be pasted straight away
+        job = self.queue.submit(mode, url, fmt, quality, self.output_dir)
+        self.url_input.clear()
+        self.status_label.setText(f"Added to queue: {url}")
+        logger.info("Job queued", extra={"queue_id": job.id, "priority": job.priority})
+        self._pump()
+
+    def _pump(self) -> None:
+        """Start as many queued jobs as the concurrency limit allows."""
+        for job in self.queue.take_ready():
+            worker = DownloadWorker(job.mode, job.url, job.fmt, job.quality, job.output_dir, job_id=job.journal_id)
+            worker.finished.connect(lambda success, message, name, job=job: self._on_job_finished(job, success, message, name))
+            worker.progress.connect(lambda events, job=job: self._on_job_progress(job, events))
+            self._workers[job.id] = worker
+            worker.start()
+            logger.info("Job started", extra={"queue_id": job.id, "mode": job.mode})
+        self._refresh_queue()
+
+    def _selected_job_id(self):
+        item = self.queue_list.currentItem()
+        return item.data(Qt.UserRole) if item and item.isSelected() else None
+
+    def _on_cancel_clicked(self) -> None:
+        job_id = self._selected_job_id()
+        if job_id is None:
+            return
+        job = self.queue.cancel(job_id)
+        if job is None:
+            return
+        logger.info("Cancel clicked", extra={"queue_id": job_id, "state": job.state})
+        worker = self._workers.get(job_id)
+        if worker:
+            job.progress = "Cancelling..."
+            worker.cancel()
+        self._refresh_queue()
+
+    def _move_selected(self, offset: int) -> None:
+        job_id = self._selected_job_id()
+        if job_id is not None and self.queue.move(job_id, offset):
+            self._refresh_queue()
+
+    def _on_clear_finished(self) -> None:
+        self.queue.clear_finished()
+        self._refresh_queue()
+
+    def _on_max_running_changed(self, value: int) -> None:
+        self.queue.set_max_running(value)
+        self._pump()
+
+    def _on_job_progress(self, job, events: list):
+        """Show the job's most recent progress event in its queue row."""
+        worker = self._workers.get(job.id)
+        if not events or worker is None or worker.token.cancelled:
+            return
+        job.progress = format_progress(events[-1])
+        item = self._queue_items.get(job.id)
+        if item:
+            item.setText(self._job_text(job))
+
+    def _on_job_finished(self, job, success: bool, message: str, video_name: str):
+        """Handle one job's completion and start the next queued job."""
+        worker = self._workers.pop(job.id, None)
+        if worker:
+            # run() is returning; wait so the QThread isn't destroyed while still running
+            worker.wait()
+        if worker and worker.token.cancelled:
+            state = CANCELLED
+        else:
+            state = DONE if success else FAILED
+        job.progress = ""
+        self.queue.finish(job, state, message)
+        self._finished_batch.append(job)
         if success:
             logger.info("Download completed successfully", extra={"video_name": video_name})
         else:
-            logger.error("Download failed", extra={"message": message})
-    
+            logger.error("Download failed", extra={"result_message": message})
+        self._pump()
+        if self.queue.idle:
+            self._report_batch()
+
+    def _report_batch(self) -> None:
+        """One toast once the queue drains: the job's own message, or a summary for several."""
+        jobs, self._finished_batch = self._finished_batch, []
+        self.status_label.setText("")
+        if not jobs or all(job.state == CANCELLED for job in jobs):
+            return
+        if len(jobs) == 1:
+            self._show_toast(jobs[0].message, jobs[0].state == DONE)
+            return
+        failed = sum(1 for job in jobs if job.state == FAILED)
+        done = sum(1 for job in jobs if job.state == DONE)
+        text = f"{done} of {len(jobs)} jobs completed" + (f", {failed} failed" if failed else "")
+        self._show_toast(text, failed == 0)
+
+    def _job_text(self, job) -> str:
+        parts = [STATE_LABELS[job.state], MODE_LABELS.get(job.mode, job.mode.title()), job.url or "interrupted job"]
+        detail = job.progress if job.state == RUNNING else job.message
+        if detail:
+            parts.append(detail)
+        return " · ".join(parts)
+
+    def _refresh_queue(self) -> None:
+        """Rebuild the queue list, keeping the selection."""
+        selected = self._selected_job_id()
+        self.queue_list.clear()
+        self._queue_items = {}
+        for job in self.queue.jobs():
+            item = QListWidgetItem(self._job_text(job))
+            item.setData(Qt.UserRole, job.id)
+            self.queue_list.addItem(item)
+            self._queue_items[job.id] = item
+            if job.id == selected:
+                item.setSelected(True)
+                self.queue_list.setCurrentItem(item)
+        counts = self.queue.counts()
+        self.queue_label.setText(f"Queue · {counts['running']} running, {counts['queued']} waiting")
+        if counts["running"]:
+            self.spinner.start()
+        else:
+            self.spinner.stop()
+        self._update_queue_actions()
+
+    def _update_queue_actions(self) -> None:
+        job_id = self._selected_job_id()
+        job = next((j for j in self.queue.jobs() if j.id == job_id), None)
+        queued = job is not None and job.state == QUEUED
+        self.move_up_btn.setEnabled(queued)
+        self.move_down_btn.setEnabled(queued)
+        worker = self._workers.get(job_id)
+        stopping = worker is not None and worker.token.cancelled
+        self.cancel_btn.setEnabled(job is not None and not job.finished and not stopping)
+        self.clear_btn.setEnabled(self.queue.counts()["finished"] > 0)
+
+    def closeEvent(self, event):
+        # Don't leave encodes running (or their temp files behind) after the window is gone
+        for worker in list(self._workers.values()):
+            worker.cancel()
+        for worker in list(self._workers.values()):
+            worker.wait(5000)
+        super().closeEvent(event)
+
     def _show_toast(self, message: str, is_success: bool):
         """Show a toast message to the user."""
         from PySide6.QtWidgets import QMessageBox
@@ -484,11 +848,18 @@ class ConverterWindow(QMainWindow):
         msg_box.exec()
 
 
+def _warm_up_in_background() -> None:
+    # yt_dlp/ffmpeg are imported lazily; load them off the GUI thread once the window is up
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
 def main() -> None:
+    configure_logging()
     app = QApplication([])
     app.setWindowIcon(QIcon(str(resource_path("icon.ico"))))
     window = ConverterWindow()
     window.showMaximized()
+    QTimer.singleShot(0, _warm_up_in_background)
     tray_icon = QSystemTrayIcon(QIcon(str(icon_path)), parent=None)
     tray_icon.show()
     app.exec()
@@ -0,0 +1,105 @@
+"""
+On-disk cache of yt-dlp info dicts keyed by video ID.
+
+Extraction is the slowest and most rate-limited step per item, so an info
+dict fetched once is kept (with a TTL, since stream URLs expire) and reused
+for the actual download and for later runs. Entries beyond ``max_entries``
+are evicted least-recently-used first.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import INFO_CACHE_FILE
+from file_utils import app_data_path
+
+logger = logging.getLogger(__name__)
+
+# Stream URLs in YouTube info dicts stop working after ~6 hours
+DEFAULT_TTL = 3 * 60 * 60
+DEFAULT_MAX_ENTRIES = 500
+
+
+class InfoCache:
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS info ("
+                " video_id TEXT PRIMARY KEY,"
+                " stored_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, video_id):
+        """Return the cached info dict for ``video_id``, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT stored_at, data FROM info WHERE video_id = ?", (video_id,)).fetchone()
+                if row is None or now - row[0] > self.ttl:
+                    if row is not None:
+                        conn.execute("DELETE FROM info WHERE video_id = ?", (video_id,))
+                        conn.commit()
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE info SET last_used = ? WHERE video_id = ?", (now, video_id))
+                conn.commit()
+                info = json.loads(row[1])
+            except (sqlite3.Error, ValueError) as e:
+                logger.error("Info cache read failed", extra={"video_id": video_id, "error": str(e)})
+                self.misses += 1
+                return None
+            self.hits += 1
+            return info
+
+    def put(self, video_id, info):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO info (video_id, stored_at, last_used, data) VALUES (?, ?, ?, ?)",
+                    (video_id, now, now, json.dumps(info)),
+                )
+                # LRU eviction past the size cap
+                conn.execute(
+                    "DELETE FROM info WHERE video_id IN ("
+                    " SELECT video_id FROM info ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.error("Info cache write failed", extra={"video_id": video_id, "error": str(e)})
+
+    def invalidate(self, video_id):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM info WHERE video_id = ?", (video_id,))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error("Info cache invalidate failed", extra={"video_id": video_id, "error": str(e)})
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+info_cache = InfoCache(app_data_path(INFO_CACHE_FILE))
@@ -0,0 +1,227 @@
+"""
+Durable journal of playlist and batch jobs.
+
+Each job is an append-only JSON-lines file in the jobs folder. Every state
+change is one event line, flushed and fsync'd, so after a crash the job can
+be rebuilt by replaying the file and resumed from its unfinished items. A
+torn last line from a crash mid-write is ignored. A finished job's journal
+is deleted, or compacted to a snapshot when some of its items failed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from config import JOBS_DIR
+from file_utils import app_data_path
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_EXT = ".jsonl"
+# Item states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# Job states
+ACTIVE = "active"
+FINISHED = "finished"
+# Enough of a journal's end to hold its last event line
+TAIL_BYTES = 4096
+
+_lock = threading.Lock()
+
+
+def _jobs_dir():
+    path = app_data_path(JOBS_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _journal_path(job_id):
+    return _jobs_dir() / f"{job_id}{JOURNAL_EXT}"
+
+
+def _append(job_id, event):
+    event["ts"] = time.time()
+    line = json.dumps(event) + "\n"
+    with _lock:
+        with open(_journal_path(job_id), "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def create_job(kind, fmt, quality, target_dir=None, source_url=None, urls=()):
+    """Start a journal for a new ``kind`` ("playlist" or "batch") job and return its id."""
+    job_id = uuid.uuid4().hex
+    _append(job_id, {
+        "event": "created",
+        "kind": kind,
+        "fmt": fmt,
+        "quality": quality,
+        "target_dir": target_dir,
+        "source_url": source_url,
+    })
+    if urls:
+        add_items(job_id, urls)
+    logger.info("Job created", extra={"job_id": job_id, "kind": kind})
+    return job_id
+
+
+def add_items(job_id, urls, target_dir=None, partial=False):
+    """Append items to the job; ``target_dir`` records where they are saved (e.g. the playlist folder).
+
+    ``partial`` means more items may follow (a playlist still being listed);
+    call ``mark_enumerated`` once the list is complete.
+    """
+    event = {"event": "items", "urls": list(urls)}
+    if target_dir:
+        event["target_dir"] = target_dir
+    if partial:
+        event["partial"] = True
+    _append(job_id, event)
+
+
+def mark_enumerated(job_id):
+    """Record that every item of the job has been added."""
+    _append(job_id, {"event": "enumerated"})
+
+
+def mark_item(job_id, index, status, result=None):
+    event = {"event": "item", "index": index, "status": status}
+    if result:
+        event["result"] = result
+    _append(job_id, event)
+
+
+def update_job_progress(job_id, progress):
+    _append(job_id, {"event": "progress", "progress": progress})
+
+
+def finish_job(job_id):
+    """Mark the job finished and drop its journal, keeping a compacted copy only if some items failed.
+
+    The compacted journal holds the job, its items and their final states,
+    so ``--resume`` can still retry the failures.
+    """
+    _append(job_id, {"event": "finished"})
+    job = load_job(job_id)
+    if job is None or not pending_indexes(job):
+        delete_job(job_id)
+    else:
+        _compact(job)
+    logger.info("Job finished", extra={"job_id": job_id})
+
+
+def _compact(job):
+    """Rewrite the job's journal as a snapshot of its current state (one line per recorded item)."""
+    now = time.time()
+    events = [
+        {"event": "created", **{k: job.get(k) for k in ("kind", "fmt", "quality", "target_dir", "source_url")}},
+        {"event": "items", "urls": [item["url"] for item in job["items"]]},
+    ]
+    if job["items_dir"]:
+        events[1]["target_dir"] = job["items_dir"]
+    for idx, item in enumerate(job["items"]):
+        if item["status"] != QUEUED:
+            event = {"event": "item", "index": idx, "status": item["status"]}
+            if item["result"]:
+                event["result"] = item["result"]
+            events.append(event)
+    events.append({"event": "progress", "progress": job["progress"]})
+    if job["status"] == FINISHED:
+        events.append({"event": "finished"})
+    path = _journal_path(job["job_id"])
+    partial = path.with_suffix(".compact")
+    with _lock:
+        try:
+            with open(partial, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps({**event, "ts": now}) + "\n" for event in events)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, path)
+        except OSError as e:
+            logger.error("Journal compaction failed", extra={"job_id": job["job_id"], "error": str(e)})
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+
+
+def load_job(job_id):
+    """Rebuild the job state from its journal, or None if there is no journal.
+
+    ``target_dir`` is where the items are saved; ``items_dir`` is set only
+    once ``add_items`` has recorded a folder of its own (e.g. the playlist's).
+    """
+    path = _journal_path(job_id)
+    if not path.exists():
+        return None
+    job = {"job_id": job_id, "status": ACTIVE, "progress": 0, "items": [], "enumerated": True, "items_dir": None}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Torn write from a crash
+                break
+            kind = event.get("event")
+            if kind == "created":
+                job.update({k: event.get(k) for k in ("kind", "fmt", "quality", "target_dir", "source_url")})
+            elif kind == "items":
+                job["items"].extend({"url": url, "status": QUEUED, "result": None} for url in event["urls"])
+                if event.get("target_dir"):
+                    job["target_dir"] = job["items_dir"] = event["target_dir"]
+                if event.get("partial"):
+                    job["enumerated"] = False
+            elif kind == "enumerated":
+                job["enumerated"] = True
+            elif kind == "item" and 0 <= event["index"] < len(job["items"]):
+                item = job["items"][event["index"]]
+                item["status"] = event["status"]
+                item["result"] = event.get("result")
+            elif kind == "progress":
+                job["progress"] = event["progress"]
+            elif kind == "finished":
+                job["status"] = FINISHED
+    return job
+
+
+def pending_indexes(job):
+    """Indexes of items that still need to run (anything not done, including items running at crash time)."""
+    return [idx for idx, item in enumerate(job["items"]) if item["status"] != DONE]
+
+
+def _ends_finished(path):
+    """Whether the journal's last line is a ``finished`` event, read from the tail without a replay."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - TAIL_BYTES))
+            last = f.read().rstrip(b"\n").rpartition(b"\n")[2]
+        return json.loads(last).get("event") == "finished"
+    except (OSError, ValueError, AttributeError):
+        # Unreadable or torn: let the full replay decide
+        return False
+
+
+def unfinished_jobs():
+    """Jobs whose journal has no ``finished`` event, oldest first."""
+    jobs = []
+    for path in sorted(_jobs_dir().glob(f"*{JOURNAL_EXT}"), key=os.path.getmtime):
+        if _ends_finished(path):
+            continue
+        job = load_job(path.stem)
+        if job and job["status"] != FINISHED and job.get("kind"):
+            jobs.append(job)
+    return jobs
+
+
+def delete_job(job_id):
+    try:
+        _journal_path(job_id).unlink()
+    except OSError:
+        pass
@@ -0,0 +1,147 @@
+"""
+Run order and concurrency bookkeeping for the jobs submitted in the GUI.
+
+The queue itself runs nothing. The window asks it which jobs may start
+(``take_ready``), starts a worker for each, and reports back with ``finish``.
+Jobs run in priority order: single videos go ahead of batch files and
+playlists, so a quick link pasted mid-session doesn't wait behind a
+hundred-item playlist. Within a priority, jobs run in submission order.
+Queued jobs can be moved up or down by hand and cancelled. ``max_running``
+caps how many jobs run at once. The encoders and per-host request pacing
+are shared by every job (transcode scheduler, rate limiter), so the cap only
+limits how much is in flight, not how hard the machine or a site is pushed.
+"""
+import itertools
+import threading
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Lower runs first
+PRIORITY_SINGLE = 0
+PRIORITY_RESUME = 1
+PRIORITY_BULK = 2
+MODE_PRIORITIES = {"single video": PRIORITY_SINGLE, "resume": PRIORITY_RESUME}
+DEFAULT_MAX_RUNNING = 2
+MAX_RUNNING_LIMIT = 8
+
+
+class QueuedJob:
+    def __init__(self, job_id, mode, url, fmt, quality, output_dir, priority, journal_id=None):
+        self.id = job_id
+        self.mode = mode
+        self.url = url
+        self.fmt = fmt
+        self.quality = quality
+        self.output_dir = output_dir
+        self.priority = priority
+        # job_manager journal of a resumed playlist/batch job
+        self.journal_id = journal_id
+        self.state = QUEUED
+        self.message = ""
+        self.progress = ""
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+
+class JobQueue:
+    def __init__(self, max_running=DEFAULT_MAX_RUNNING):
+        self.max_running = max_running
+        self._pending = []
+        self._running = []
+        self._finished = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, mode, url, fmt, quality, output_dir, journal_id=None, priority=None):
+        """Queue a job behind every queued job of the same or higher priority; returns it."""
+        if priority is None:
+            priority = MODE_PRIORITIES.get(mode, PRIORITY_BULK)
+        job = QueuedJob(next(self._ids), mode, url, fmt, quality, output_dir, priority, journal_id)
+        with self._lock:
+            position = len(self._pending)
+            while position > 0 and self._pending[position - 1].priority > priority:
+                position -= 1
+            self._pending.insert(position, job)
+        return job
+
+    def take_ready(self):
+        """Jobs to start now, in run order, marked running; empty when the cap is reached."""
+        ready = []
+        with self._lock:
+            while self._pending and len(self._running) < self.max_running:
+                job = self._pending.pop(0)
+                job.state = RUNNING
+                self._running.append(job)
+                ready.append(job)
+        return ready
+
+    def finish(self, job, state, message=""):
+        """Record that a running job ended in ``state`` (DONE, FAILED or CANCELLED)."""
+        with self._lock:
+            if job in self._running:
+                self._running.remove(job)
+            job.state = state
+            job.message = message
+            self._finished.append(job)
+
+    def cancel(self, job_id):
+        """Cancel a job. A queued job is dropped at once; a running one is returned for the caller to stop.
+
+        Returns the job, or None if it is unknown or already finished.
+        """
+        with self._lock:
+            for job in self._pending:
+                if job.id == job_id:
+                    self._pending.remove(job)
+                    job.state = CANCELLED
+                    job.message = "Cancelled before it started"
+                    self._finished.append(job)
+                    return job
+            for job in self._running:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def move(self, job_id, offset):
+        """Move a queued job ``offset`` places earlier (negative) or later in the run order; False if it can't move."""
+        with self._lock:
+            index = next((i for i, job in enumerate(self._pending) if job.id == job_id), None)
+            if index is None:
+                return False
+            target = max(0, min(len(self._pending) - 1, index + offset))
+            if target == index:
+                return False
+            job = self._pending.pop(index)
+            # Moving by hand overrides the priority it was queued with
+            self._pending.insert(target, job)
+            return True
+
+    def set_max_running(self, count):
+        with self._lock:
+            self.max_running = max(1, min(MAX_RUNNING_LIMIT, count))
+
+    def clear_finished(self):
+        with self._lock:
+            self._finished.clear()
+
+    def jobs(self):
+        """Every job for display: running, then queued in run order, then finished (newest first)."""
+        with self._lock:
+            return self._running + self._pending + self._finished[::-1]
+
+    def counts(self):
+        with self._lock:
+            return {"running": len(self._running), "queued": len(self._pending), "finished": len(self._finished)}
+
+    @property
+    def idle(self):
+        with self._lock:
+            return not self._running and not self._pending
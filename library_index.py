@@ -0,0 +1,104 @@
+"""
+SQLite index of finished downloads, stored in each output directory.
+
+Rows are keyed by (video ID, format, quality) and point at the converted
+file, so re-syncing a playlist can skip items that are already on disk
+before doing any network work.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import LIBRARY_INDEX_FILE
+
+logger = logging.getLogger(__name__)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class LibraryIndex:
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, LIBRARY_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.base_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                " video_id TEXT NOT NULL,"
+                " fmt TEXT NOT NULL,"
+                " quality INTEGER NOT NULL,"
+                " filename TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " completed_at REAL NOT NULL,"
+                " PRIMARY KEY (video_id, fmt, quality))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def lookup(self, video_id, fmt, quality):
+        """Return the filename of a finished download that is still intact on disk, else None."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT filename, size FROM downloads WHERE video_id = ? AND fmt = ? AND quality = ?",
+                    (video_id, fmt, quality or 0),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error("Library index read failed", extra={"video_id": video_id, "error": str(e)})
+                return None
+        if row is None:
+            return None
+        filename, size = row
+        try:
+            if os.path.getsize(os.path.join(self.base_dir, filename)) == size:
+                return filename
+        except OSError:
+            pass
+        # Deleted or truncated since it was recorded
+        return None
+
+    def owner(self, filename):
+        """Video ID that ``filename`` was recorded for, or None if it isn't in the index."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT video_id FROM downloads WHERE filename = ? ORDER BY completed_at DESC LIMIT 1", (filename,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error("Library index read failed", extra={"output": filename, "error": str(e)})
+                return None
+        return row[0] if row else None
+
+    def record(self, video_id, fmt, quality, filename):
+        try:
+            size = os.path.getsize(os.path.join(self.base_dir, filename))
+        except OSError:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO downloads (video_id, fmt, quality, filename, size, completed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_id, fmt, quality or 0, filename, size, time.time()),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error("Library index write failed", extra={"video_id": video_id, "error": str(e)})
+
+
+def library_for(base_dir):
+    """Return the shared LibraryIndex for ``base_dir``."""
+    key = os.path.abspath(base_dir)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LibraryIndex(key)
+        return _indexes[key]
@@ -0,0 +1,28 @@
+import logging
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class ExtraFormatter(logging.Formatter):
+    """Formatter that appends the ``extra={...}`` fields as key=value pairs."""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        if extras:
+            line += " " + " ".join(f"{k}={v!r}" for k, v in extras.items())
+        return line
+
+
+def configure_logging(level=logging.INFO):
+    """Install the extra-aware formatter on the root logger (once)."""
+    root = logging.getLogger()
+    if any(isinstance(h.formatter, ExtraFormatter) for h in root.handlers):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(ExtraFormatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
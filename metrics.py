@@ -0,0 +1,204 @@
+"""
+Per-stage timing spans for every item, plus an opt-in sampling profiler.
+
+Each span records one stage of one item (extract, download, encode,
+metadata, cleanup, ...) with its duration, byte count and outcome. Spans
+are kept in memory for ``summary()``, which reports p50/p95 per stage and
+the slowest items, and appended to a JSON-lines metrics file. The file
+defaults to ``metrics.jsonl`` in the app's data folder
+(``file_utils.app_data_path``); ``SMUGGY_METRICS_FILE`` (or the CLI's
+``--metrics-file``) moves it, and an empty value turns it off.
+Past ``max_bytes`` the file is rotated to ``<name>.1``, so at most two
+files' worth is kept.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import METRICS_FILE, METRICS_FILE_ENV
+from file_utils import app_data_path
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_IN_MEMORY = 20000
+DEFAULT_MAX_FILE_BYTES = 16 * 1024 ** 2
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class MetricsRecorder:
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_FILE_BYTES):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self._spans = deque(maxlen=MAX_SPANS_IN_MEMORY)
+        self._lock = threading.Lock()
+        self._file_bytes = None
+
+    def configure(self, path, max_bytes=None):
+        """Append spans to ``path`` (None keeps them in memory only), rotating it past ``max_bytes``."""
+        with self._lock:
+            self.path = Path(path) if path else None
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._file_bytes = None
+
+    @contextmanager
+    def span(self, stage, item=None, **fields):
+        """Time a stage of ``item``; the yielded dict can be updated (e.g. ``record["bytes"] = n``)."""
+        record = {"stage": stage, "item": item, **fields}
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["outcome"] = "error"
+            record["error"] = str(e)[:500]
+            raise
+        else:
+            record.setdefault("outcome", "ok")
+        finally:
+            record["duration_s"] = round(time.perf_counter() - started, 6)
+            record["ts"] = time.time()
+            self._add(record)
+
+    def _add(self, record):
+        with self._lock:
+            self._spans.append(record)
+            if self.path is None:
+                return
+            line = json.dumps(record, default=str) + "\n"
+            try:
+                if self._file_bytes is None:
+                    self._file_bytes = self.path.stat().st_size if self.path.exists() else 0
+                if self._file_bytes and self._file_bytes + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+                    self._file_bytes = 0
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                self._file_bytes += len(line)
+            except OSError as e:
+                logger.error("Metrics write failed", extra={"error": str(e)})
+
+    def spans(self, since=None):
+        with self._lock:
+            return [s for s in self._spans if since is None or s["ts"] >= since]
+
+    def summary(self, since=None, slowest=5):
+        """p50/p95/total seconds and bytes per stage, and the items with the most total time."""
+        spans = self.spans(since)
+        stages = {}
+        per_item = Counter()
+        for span in spans:
+            stages.setdefault(span["stage"], []).append(span)
+            if span.get("item"):
+                per_item[span["item"]] += span["duration_s"]
+        report = {"stages": {}, "slowest_items": []}
+        for stage, stage_spans in stages.items():
+            durations = sorted(s["duration_s"] for s in stage_spans)
+            report["stages"][stage] = {
+                "count": len(durations),
+                "errors": sum(1 for s in stage_spans if s["outcome"] != "ok"),
+                "p50_s": _percentile(durations, 50),
+                "p95_s": _percentile(durations, 95),
+                "total_s": round(sum(durations), 3),
+                "bytes": sum(s.get("bytes") or 0 for s in stage_spans),
+            }
+        for item, total in per_item.most_common(slowest):
+            stage_times = {s["stage"]: s["duration_s"] for s in spans if s.get("item") == item}
+            report["slowest_items"].append({"item": item, "total_s": round(total, 3), "stages": stage_times})
+        return report
+
+    def format_summary(self, since=None):
+        report = self.summary(since)
+        lines = [f"{'stage':12} {'count':>6} {'p50 s':>9} {'p95 s':>9} {'total s':>9} {'MB':>9}"]
+        for stage, row in sorted(report["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(
+                f"{stage:12} {row['count']:>6} {row['p50_s']:>9.3f} {row['p95_s']:>9.3f} "
+                f"{row['total_s']:>9.2f} {row['bytes'] / 1e6:>9.2f}"
+            )
+        for entry in report["slowest_items"]:
+            lines.append(f"slow: {entry['total_s']:.2f}s {entry['item']} {entry['stages']}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Samples the stacks of every other thread every ``interval`` seconds.
+
+    Output is in collapsed-stack format (``frame;frame;frame count``), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit=15):
+        """Leaf frames with the most samples: where the time actually went."""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+@contextmanager
+def profile_job(path, interval=0.005):
+    """Opt-in: sample all threads while the block runs and write collapsed stacks to ``path``."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write_collapsed(path)
+        logger.info("Profile written", extra={"path": str(path), "top": profiler.top_functions(5)})
+
+
+def _default_path():
+    configured = os.environ.get(METRICS_FILE_ENV)
+    if configured is None:
+        return app_data_path(METRICS_FILE)
+    return configured or None
+
+
+recorder = MetricsRecorder(_default_path())
+span = recorder.span
@@ -0,0 +1,120 @@
+"""
+Two-stage download -> transcode pipeline used by the playlist and batch paths.
+
+Download workers fetch sources and hand them to transcode workers through a
+bounded queue, so the network and the CPU are busy at the same time. When the
+queue is full the download workers block, which caps how many finished temp
+files can pile up on disk.
+"""
+import logging
+import queue
+import threading
+
+from process_runner import Cancelled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_TRANSCODE_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def run_pipeline(
+    urls,
+    fetch,
+    transcode,
+    download_workers=DEFAULT_DOWNLOAD_WORKERS,
+    transcode_workers=DEFAULT_TRANSCODE_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    on_result=None,
+    on_start=None,
+):
+    """Run every url through ``fetch(index, url)`` then ``transcode(index, source)``.
+
+    Returns one result dict per url, in input order, in the same
+    ``{"url", "file_id", "status"}`` shape as the sequential loop. A failure in
+    either stage only marks that item as failed; an item stopped by Cancelled
+    gets status "cancelled". ``on_result(index, result)`` is
+    called from a worker thread as each item finishes, one call at a time;
+    ``on_start(index)`` is called as an item's download begins. An exception
+    from either callback is logged and doesn't affect the item or the run.
+    """
+    items = iter(enumerate(urls))
+    items_lock = threading.Lock()
+    results = {}
+    results_lock = threading.Lock()
+    sources = queue.Queue(maxsize=max(1, queue_size))
+
+    def _next_item():
+        with items_lock:
+            return next(items, None)
+
+    def _failed(url, stage, e):
+        if isinstance(e, Cancelled):
+            logger.info("Item cancelled", extra={"url": url, "stage": stage})
+            return {"url": url, "error": str(e), "status": "cancelled"}
+        logger.error("Item failed", extra={"url": url, "stage": stage, "error": str(e)})
+        return {"url": url, "error": str(e), "status": "failed"}
+
+    def _callback(name, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            # A broken stdout pipe or a full disk under the journal must not stall the workers
+            logger.error("Pipeline callback failed", extra={"callback": name, "index": args[0], "error": str(e)})
+
+    def _finish(idx, result):
+        # Callbacks run under the lock, so they never overlap
+        with results_lock:
+            results[idx] = result
+            if on_result:
+                _callback("on_result", on_result, idx, result)
+
+    def _download_loop():
+        while True:
+            item = _next_item()
+            if item is None:
+                return
+            idx, url = item
+            if on_start:
+                _callback("on_start", on_start, idx)
+            try:
+                source = fetch(idx, url)
+            except Exception as e:
+                _finish(idx, _failed(url, "download", e))
+                continue
+            # Blocks while the transcode stage is behind (backpressure)
+            sources.put((idx, url, source))
+
+    def _transcode_loop():
+        while True:
+            entry = sources.get()
+            if entry is _DONE:
+                return
+            idx, url, source = entry
+            try:
+                result = {"url": url, "file_id": transcode(idx, source), "status": "success"}
+            except Exception as e:
+                result = _failed(url, "transcode", e)
+            _finish(idx, result)
+
+    downloaders = [
+        threading.Thread(target=_download_loop, name=f"download-{n}", daemon=True)
+        for n in range(max(1, download_workers))
+    ]
+    transcoders = [
+        threading.Thread(target=_transcode_loop, name=f"transcode-{n}", daemon=True)
+        for n in range(max(1, transcode_workers))
+    ]
+    for thread in downloaders + transcoders:
+        thread.start()
+    for thread in downloaders:
+        thread.join()
+    for _ in transcoders:
+        sources.put(_DONE)
+    for thread in transcoders:
+        thread.join()
+
+    return [results[idx] for idx in sorted(results)]
@@ -0,0 +1,243 @@
+"""
+Cancellation for running jobs, and child processes that can be killed mid-run.
+
+A CancelToken is passed down a job's call chain. Cancelling it does four
+things:
+  * kills any ffmpeg child the job is running
+  * stops yt-dlp and segmented transfers at their next chunk
+  * wakes a worker waiting on the rate limiter
+  * makes every later stage raise Cancelled instead of starting
+
+``stage(token, name)`` derives a token for one stage of one item. That
+token is also cancelled once the stage has run longer than its wall-clock
+limit (``set_stage_timeout``), and the stage then raises StageTimeout.
+
+A child's stderr is kept in a bounded ring buffer (StderrTail) rather than
+read into memory whole. A long encode can't grow it without limit, and the
+tail is what goes into error messages.
+"""
+import collections
+import logging
+import subprocess
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# How much of a child's stderr is kept for error messages
+STDERR_TAIL_BYTES = 64 * 1024
+# Longest stderr line read in one go (ffmpeg stats lines end in \r, not \n)
+STDERR_LINE_BYTES = 4096
+# Cancel reasons
+CANCELLED = "cancelled"
+TIMED_OUT = "timeout"
+
+_stage_timeouts = {}
+_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class StageTimeout(Exception):
+    pass
+
+
+class ProcessError(Exception):
+    """A child exited with a non-zero status; ``stderr`` holds the tail of its stderr as bytes."""
+
+    def __init__(self, args, returncode, stderr):
+        super().__init__(f"{args[0]} exited with status {returncode}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def set_stage_timeout(stage, seconds):
+    """Limit every ``stage`` ("download", "encode", "stream") to ``seconds`` of wall-clock time; None removes the limit."""
+    with _lock:
+        if seconds:
+            _stage_timeouts[stage] = seconds
+        else:
+            _stage_timeouts.pop(stage, None)
+
+
+def stage_timeout(stage):
+    with _lock:
+        return _stage_timeouts.get(stage)
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+        self.message = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason=CANCELLED, message=None):
+        """Cancel the token and run its callbacks; later calls do nothing."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self.message = message or reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Cancel callback failed", extra={"error": str(e)})
+
+    def on_cancel(self, callback):
+        """Call ``callback()`` once when the token is cancelled, or now if it already is.
+
+        Returns a function that unregisters the callback.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def wait(self, timeout=None):
+        """Block until the token is cancelled or ``timeout`` passes; True if cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """Raise StageTimeout or Cancelled if the token has been cancelled."""
+        if not self._event.is_set():
+            return
+        if self.reason == TIMED_OUT:
+            raise StageTimeout(self.message)
+        raise Cancelled(self.message)
+
+
+@contextmanager
+def stage(token, name):
+    """Yield a token for one stage. It is cancelled along with ``token`` (which may be None) or when ``name``'s timeout runs out."""
+    child = CancelToken()
+    unlink = token.on_cancel(lambda: child.cancel(token.reason, token.message)) if token else None
+    timeout = stage_timeout(name)
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, child.cancel, (TIMED_OUT, f"{name} timed out after {timeout:g}s"))
+        timer.daemon = True
+        timer.start()
+    try:
+        yield child
+    finally:
+        if timer:
+            timer.cancel()
+        if unlink:
+            unlink()
+
+
+class StderrTail:
+    """The last ``max_bytes`` of a stream, kept as a ring of lines."""
+
+    def __init__(self, max_bytes=STDERR_TAIL_BYTES):
+        self.max_bytes = max_bytes
+        self._lines = collections.deque()
+        self._size = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def feed(self, line):
+        line = line[-self.max_bytes:]
+        with self._lock:
+            self._lines.append(line)
+            self._size += len(line)
+            while self._size > self.max_bytes:
+                self._size -= len(self._lines.popleft())
+                self._dropped += 1
+
+    def getvalue(self):
+        with self._lock:
+            head = f"[... {self._dropped} earlier lines dropped ...]\n".encode() if self._dropped else b""
+            return head + b"".join(self._lines)
+
+    def drain(self, stream):
+        """Read ``stream`` into the tail on a background thread until EOF; returns the started thread."""
+        def _read():
+            try:
+                for line in iter(lambda: stream.readline(STDERR_LINE_BYTES), b""):
+                    self.feed(line)
+            except (OSError, ValueError):
+                # Closed under us after a kill
+                pass
+
+        thread = threading.Thread(target=_read, name="stderr-drain", daemon=True)
+        thread.start()
+        return thread
+
+
+def _kill(process):
+    if process.poll() is None:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+@contextmanager
+def kill_on_cancel(process, token):
+    """Kill ``process`` if ``token`` (which may be None) is cancelled during the block, or if the block raises."""
+    unregister = token.on_cancel(lambda: _kill(process)) if token else None
+    try:
+        yield process
+    except BaseException:
+        _kill(process)
+        raise
+    finally:
+        if unregister:
+            unregister()
+
+
+def run_process(args, token=None, on_stdout_line=None):
+    """Run ``args`` to completion as a child process that ``token`` can kill.
+
+    ``on_stdout_line(bytes)`` gets each stdout line; without it stdout is
+    discarded. Raises Cancelled or StageTimeout if the token was cancelled
+    (the child is killed first). Raises ProcessError with the stderr tail on
+    a non-zero exit.
+    """
+    if token:
+        token.raise_if_cancelled()
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if on_stdout_line else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    tail = StderrTail()
+    drain = tail.drain(process.stderr)
+    try:
+        with kill_on_cancel(process, token):
+            if on_stdout_line:
+                for line in process.stdout:
+                    on_stdout_line(line)
+            process.wait()
+    finally:
+        process.wait()
+        drain.join()
+        if process.stdout:
+            process.stdout.close()
+        process.stderr.close()
+    if token:
+        token.raise_if_cancelled()
+    if process.returncode != 0:
+        raise ProcessError(args, process.returncode, tail.getvalue())
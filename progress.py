@@ -0,0 +1,94 @@
+"""
+Progress events for downloads and encodes, and a throttle that rate-limits them.
+
+Events are plain dicts with a ``stage`` ("download" or "encode") plus the
+fields that stage knows about. Downloads report ``downloaded_bytes``,
+``total_bytes`` and ``speed`` in bytes/s. Encodes report ``out_time`` in
+seconds and ``speed`` as a realtime multiple. Playlist and batch jobs add
+``item_index`` and ``item_total``.
+"""
+import threading
+import time
+
+DEFAULT_MAX_RATE = 10  # flushes per second
+
+
+def download_event(hook_data):
+    """Translate a yt-dlp ``progress_hooks`` dict into a download event."""
+    return {
+        "stage": "download",
+        "status": hook_data.get("status"),
+        "downloaded_bytes": hook_data.get("downloaded_bytes"),
+        "total_bytes": hook_data.get("total_bytes") or hook_data.get("total_bytes_estimate"),
+        "speed": hook_data.get("speed"),
+    }
+
+
+def encode_event(fields):
+    """Translate one block of ffmpeg ``-progress`` key=value fields into an encode event."""
+    out_time = None
+    try:
+        out_time = int(fields.get("out_time_us") or fields.get("out_time_ms")) / 1_000_000
+    except (TypeError, ValueError):
+        pass
+    speed = None
+    try:
+        speed = float(fields.get("speed", "").rstrip("x"))
+    except ValueError:
+        pass
+    return {
+        "stage": "encode",
+        "status": "finished" if fields.get("progress") == "end" else "encoding",
+        "out_time": out_time,
+        "speed": speed,
+        "total_size": int(fields["total_size"]) if fields.get("total_size", "").isdigit() else None,
+    }
+
+
+def for_item(progress, index, total):
+    """Wrap ``progress`` so every event it receives is tagged with the item position."""
+    if progress is None:
+        return None
+
+    def _tagged(event):
+        progress({**event, "item_index": index, "item_total": total})
+    return _tagged
+
+
+class ProgressThrottle:
+    """Coalesce progress events and hand them to ``emit`` at most ``max_rate`` times per second.
+
+    Only the newest event per item is kept between flushes, so a large
+    playlist produces a bounded stream of updates however chatty yt-dlp
+    and ffmpeg are. ``emit`` gets a list of events. Call ``flush()`` once
+    the job ends so the last state is not lost.
+    """
+
+    def __init__(self, emit, max_rate=DEFAULT_MAX_RATE):
+        self._emit = emit
+        self._interval = 1.0 / max_rate if max_rate else 0.0
+        self._pending = {}
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event.get("item_index"), event.get("stage"))
+        with self._lock:
+            self._pending[key] = event
+            # Stage boundaries always go through so the UI never misses a finish
+            due = event.get("status") == "finished" or time.monotonic() - self._last_flush >= self._interval
+            batch = self._take() if due else None
+        if batch:
+            self._emit(batch)
+
+    def _take(self):
+        batch = list(self._pending.values())
+        self._pending.clear()
+        self._last_flush = time.monotonic()
+        return batch
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._emit(batch)
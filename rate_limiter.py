@@ -0,0 +1,218 @@
+"""
+Request pacing shared by every download worker, per host.
+
+Each host (all YouTube hosts count as one) has a token bucket. A request
+takes a token first. The bucket's rate follows AIMD: every clean request
+raises it by a small step, and an HTTP 429/403 or a throttled transfer
+halves it. After a throttle, the host is also paused for the server's
+Retry-After, when there is one. The limiter settles just below the rate the
+site tolerates and climbs back up once the errors stop. A request that was
+throttled is retried a few times before its error is raised.
+"""
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from url_utils import YOUTUBE_HOSTS
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = (429, 403)
+# yt-dlp flattens most HTTP errors into the message
+_STATUS_RE = re.compile(r"HTTP Error (\d{3})")
+# Transfers of at least this size averaging under THROTTLED_BYTES_PER_S count as throttled
+THROTTLED_BYTES_PER_S = 64 * 1024
+THROTTLE_MIN_BYTES = 2 * 1024 * 1024
+MAX_THROTTLE_RETRIES = 3
+# A burst of concurrent errors is one signal, not one halving per worker
+DECREASE_COOLDOWN_S = 2.0
+MAX_RETRY_AFTER_S = 300.0
+_YOUTUBE_MEDIA_SUFFIXES = (".googlevideo.com", ".ytimg.com")
+
+
+def host_key(url):
+    """Bucket key for ``url``: "youtube" for YouTube and its media hosts, otherwise the host name."""
+    host = (urlparse(url if "://" in url else "https://" + url).hostname or "").lower()
+    if host in YOUTUBE_HOSTS or host in ("youtu.be", "www.youtu.be") or host.endswith(_YOUTUBE_MEDIA_SUFFIXES):
+        return "youtube"
+    return host.removeprefix("www.")
+
+
+def _error_chain(error):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, "exc_info", None)
+        nested = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = nested or getattr(error, "cause", None) or error.__cause__ or error.__context__
+
+
+def http_status(error):
+    """The HTTP status behind an exception raised by yt-dlp or urllib, or None."""
+    chain = list(_error_chain(error))
+    for err in chain:
+        status = getattr(err, "status", None) or getattr(err, "code", None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+    for err in chain:
+        match = _STATUS_RE.search(str(err))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def throttle_info(error):
+    """``(throttled, retry_after_s)`` for an exception raised by yt-dlp or urllib."""
+    chain = list(_error_chain(error))
+    # The HTTP error itself (with its headers) usually sits at the end of the chain
+    for err in chain:
+        status = getattr(err, "status", None) or getattr(err, "code", None)
+        if isinstance(status, int) and status in THROTTLE_STATUSES:
+            headers = getattr(getattr(err, "response", None), "headers", None) or getattr(err, "headers", None) or {}
+            try:
+                return True, min(MAX_RETRY_AFTER_S, float(headers.get("Retry-After")))
+            except (TypeError, ValueError):
+                return True, None
+    for err in chain:
+        match = _STATUS_RE.search(str(err))
+        if match and int(match.group(1)) in THROTTLE_STATUSES:
+            return True, None
+    return False, None
+
+
+class _Bucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "waited_s": 0.0}
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimiter:
+    def __init__(self, initial_rate=1.0, min_rate=0.05, max_rate=4.0, burst=4, increase=0.05, decrease=0.5):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self._buckets = {}
+        self._cond = threading.Condition()
+
+    def configure(self, **settings):
+        """Change limits at runtime (e.g. ``max_rate`` from the CLI); existing buckets are clamped."""
+        with self._cond:
+            for name, value in settings.items():
+                if not hasattr(self, name) or name.startswith("_"):
+                    raise ValueError(f"Unknown rate limiter setting: {name}")
+                setattr(self, name, value)
+            for bucket in self._buckets.values():
+                bucket.rate = min(self.max_rate, max(self.min_rate, bucket.rate))
+                bucket.burst = self.burst
+            self._cond.notify_all()
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(min(self.initial_rate, self.max_rate), self.burst)
+        return bucket
+
+    def acquire(self, key, token=None):
+        """Block until ``key`` may send a request; returns the seconds waited.
+
+        Raises Cancelled (or StageTimeout) if ``token`` is cancelled while
+        waiting, e.g. out a long Retry-After pause.
+        """
+        unregister = token.on_cancel(self._wake) if token else None
+        try:
+            return self._take(key, token)
+        finally:
+            if unregister:
+                unregister()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _take(self, key, token):
+        started = time.monotonic()
+        with self._cond:
+            bucket = self._bucket(key)
+            while True:
+                if token:
+                    token.raise_if_cancelled()
+                now = time.monotonic()
+                bucket.refill(now)
+                if now >= bucket.paused_until and bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    break
+                wait = max(bucket.paused_until - now, (1 - bucket.tokens) / bucket.rate)
+                # Woken early when the limits change or the token is cancelled
+                self._cond.wait(wait)
+            waited = time.monotonic() - started
+            bucket.stats["requests"] += 1
+            bucket.stats["waited_s"] += waited
+        return waited
+
+    def report_success(self, key):
+        with self._cond:
+            bucket = self._bucket(key)
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    def report_throttled(self, key, retry_after=None):
+        now = time.monotonic()
+        with self._cond:
+            bucket = self._bucket(key)
+            bucket.stats["throttled"] += 1
+            if now - bucket.last_decrease >= DECREASE_COOLDOWN_S:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                bucket.last_decrease = now
+            bucket.tokens = 0.0
+            bucket.paused_until = max(bucket.paused_until, now + (retry_after or 1 / bucket.rate))
+            rate = bucket.rate
+        logger.warning("Throttled, backing off", extra={"host": key, "rate": round(rate, 3), "retry_after": retry_after})
+
+    def report_transfer(self, key, size, seconds):
+        """Feed a finished download; a large one that crawled counts as throttling."""
+        if size and seconds and size >= THROTTLE_MIN_BYTES and size / seconds < THROTTLED_BYTES_PER_S:
+            self.report_throttled(key)
+
+    def call(self, url, func, retries=MAX_THROTTLE_RETRIES, token=None):
+        """Run ``func()`` under ``url``'s host limit, retrying up to ``retries`` times when it is throttled."""
+        key = host_key(url)
+        for attempt in range(retries + 1):
+            self.acquire(key, token)
+            try:
+                result = func()
+            except Exception as e:
+                throttled, retry_after = throttle_info(e)
+                if not throttled:
+                    raise
+                self.report_throttled(key, retry_after)
+                if attempt == retries:
+                    raise
+                logger.info("Retrying throttled request", extra={"url": url, "attempt": attempt + 1})
+                continue
+            self.report_success(key)
+            return result
+
+    def stats(self):
+        """Per-host request/throttle counts, time spent waiting, and the current rate."""
+        with self._cond:
+            return {
+                key: {**bucket.stats, "waited_s": round(bucket.stats["waited_s"], 3), "rate": round(bucket.rate, 3)}
+                for key, bucket in self._buckets.items()
+            }
+
+
+limiter = RateLimiter()
@@ -0,0 +1,167 @@
+"""
+Multi-connection downloads: fetch one file as byte ranges over several connections.
+
+Some sites throttle each connection rather than the client as a whole. On a
+high-latency link, one TCP stream also can't fill the pipe. Splitting a
+large file into ``Range`` requests, fetched by a few connections at once,
+gets around both. Segments are written straight to their offsets in a
+preallocated ``.part`` file. The finished file is checked against the size
+the server reported, then renamed into place. Servers that don't support
+ranges are detected up front, and the caller then uses a plain download.
+"""
+import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
+
+from process_runner import Cancelled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTIONS = 4
+# Smaller files are not worth splitting
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+# Several segments per connection, so a slow connection can't hold up the tail
+SEGMENTS_PER_CONNECTION = 4
+CHUNK_SIZE = 256 * 1024
+MAX_SEGMENT_RETRIES = 3
+READ_TIMEOUT = 30
+SEGMENTED_PROTOCOLS = ("http", "https")
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+
+class SegmentError(Exception):
+    pass
+
+
+def probe_ranges(url, headers=None):
+    """Total size of ``url`` if the server honours ``Range`` requests, else None."""
+    # Imported here: urllib.request is slow to load and only needed once a download starts
+    import urllib.request
+
+    request = urllib.request.Request(url, headers={**(headers or {}), "Range": "bytes=0-0"})
+    with urllib.request.urlopen(request, timeout=READ_TIMEOUT) as response:
+        match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+        if response.status != 206 or not match:
+            return None
+        return int(match.group(3))
+
+
+def plan_segments(size, connections):
+    """``(start, end)`` inclusive byte ranges covering ``size`` bytes."""
+    count = max(1, min(connections * SEGMENTS_PER_CONNECTION, size // MIN_SEGMENT_SIZE))
+    length = math.ceil(size / count)
+    return [(start, min(size, start + length) - 1) for start in range(0, size, length)]
+
+
+def segmented_download(url, path, connections=DEFAULT_CONNECTIONS, headers=None, on_progress=None, token=None):
+    """Download ``url`` to ``path`` over up to ``connections`` parallel ``Range`` requests.
+
+    Returns the number of bytes written. Returns None, without writing
+    anything, when the server doesn't support ranges or the file is too
+    small to be worth splitting; fall back to a plain download then.
+    ``on_progress`` receives download events. Raises SegmentError if a
+    segment keeps failing or the file comes out the wrong size; the partial
+    file is removed. Cancelling ``token`` stops every connection at its next
+    chunk and raises Cancelled (or StageTimeout).
+    """
+    import urllib.request
+
+    if token:
+        token.raise_if_cancelled()
+    size = probe_ranges(url, headers)
+    if not size or size < 2 * MIN_SEGMENT_SIZE:
+        return None
+    segments = plan_segments(size, connections)
+    work = queue.Queue()
+    for segment in segments:
+        work.put(segment)
+    part_path = f"{path}.part"
+    with open(part_path, "wb") as f:
+        f.truncate(size)
+
+    lock = threading.Lock()
+    errors = []
+    if token:
+        # Workers stop at their next chunk once errors is non-empty
+        unregister = token.on_cancel(lambda: errors.append(Cancelled(token.message)))
+    downloaded = 0
+    started = time.monotonic()
+
+    def _fetch(start, end, f):
+        nonlocal downloaded
+        offset = start
+        for attempt in range(MAX_SEGMENT_RETRIES + 1):
+            try:
+                request = urllib.request.Request(url, headers={**(headers or {}), "Range": f"bytes={offset}-{end}"})
+                with urllib.request.urlopen(request, timeout=READ_TIMEOUT) as response:
+                    if response.status != 206:
+                        raise SegmentError(f"server ignored Range (status {response.status})")
+                    f.seek(offset)
+                    while offset <= end and not errors:
+                        chunk = response.read(min(CHUNK_SIZE, end - offset + 1))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        offset += len(chunk)
+                        with lock:
+                            downloaded += len(chunk)
+                            done = downloaded
+                        if on_progress:
+                            elapsed = time.monotonic() - started
+                            on_progress({
+                                "stage": "download",
+                                "status": "downloading",
+                                "downloaded_bytes": done,
+                                "total_bytes": size,
+                                "speed": done / elapsed if elapsed else None,
+                            })
+                if offset > end or errors:
+                    return
+                raise SegmentError(f"connection closed at byte {offset} of segment {start}-{end}")
+            except Exception as e:
+                # HTTP errors (429, 403, ...) go to the caller, which knows how to back off
+                if attempt == MAX_SEGMENT_RETRIES or getattr(e, "code", None) or errors:
+                    raise
+                logger.info("Retrying segment", extra={"start": start, "end": end, "offset": offset, "error": str(e)})
+
+    def _worker():
+        with open(part_path, "r+b") as f:
+            while not errors:
+                try:
+                    start, end = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    _fetch(start, end, f)
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [
+        threading.Thread(target=_worker, name=f"segment-{n}", daemon=True)
+        for n in range(min(connections, len(segments)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if token:
+        unregister()
+
+    if not errors and (downloaded != size or os.path.getsize(part_path) != size):
+        errors.append(SegmentError(f"size mismatch: got {downloaded} of {size} bytes"))
+    if errors:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        if token:
+            token.raise_if_cancelled()
+        raise errors[0]
+    os.replace(part_path, path)
+    logger.info("Segmented download complete", extra={"bytes": size, "segments": len(segments), "connections": len(threads)})
+    return size
@@ -0,0 +1,96 @@
+"""
+Warm ``yt_dlp.YoutubeDL`` instances reused across the items of one job.
+
+Building a YoutubeDL means loading extractors, cookies and a fresh HTTP
+handler. Throwing it away after each item also throws away its open
+connections, so every item pays for new TLS handshakes. A SessionPool
+keeps one instance per worker thread and option set for the length of a
+job. A YoutubeDL is not thread-safe, so instances are never shared between
+threads. Per-item settings go in per call: the output directory through
+``paths`` and progress through a hook that forwards to the current item.
+Connections are only kept alive when yt-dlp's ``requests`` handler is
+installed; with the plain urllib handler every request opens a new one.
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+from lazy_import import LazyModule
+
+yt_dlp = LazyModule("yt_dlp")
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    def __init__(self, opts):
+        self.progress = None
+        self.ydl = yt_dlp.YoutubeDL({**opts, "progress_hooks": [self._on_progress]})
+
+    def _on_progress(self, data):
+        if self.progress:
+            self.progress(data)
+
+
+class SessionPool:
+    def __init__(self):
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0}
+
+    @contextmanager
+    def session(self, opts, progress=None, home=None):
+        """Yield this thread's YoutubeDL for ``opts``, creating it on first use.
+
+        ``progress`` receives the yt-dlp progress hook dicts for this call only.
+        ``home`` is the directory ``outtmpl`` is resolved against.
+        """
+        key = json.dumps(opts, sort_keys=True, default=repr)
+        sessions = getattr(self._local, "sessions", None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        session = sessions.get(key)
+        with self._lock:
+            if session is None:
+                session = sessions[key] = _Session(opts)
+                self._sessions.append(session)
+                self._stats["created"] += 1
+            else:
+                self._stats["reused"] += 1
+        session.progress = progress
+        session.ydl.params["paths"] = {"home": str(home)} if home else {}
+        try:
+            yield session.ydl
+        finally:
+            session.progress = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        """Close every instance (and its connections); the pool can't be used afterwards."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            try:
+                session.ydl.close()
+            except Exception as e:
+                logger.info("Closing YoutubeDL failed", extra={"error": str(e)})
+
+
+@contextmanager
+def session_from(pool, opts, progress=None, home=None):
+    """``pool.session(...)``, or a throwaway YoutubeDL closed after the block when ``pool`` is None."""
+    if pool is not None:
+        with pool.session(opts, progress, home) as ydl:
+            yield ydl
+        return
+    pool = SessionPool()
+    try:
+        with pool.session(opts, progress, home) as ydl:
+            yield ydl
+    finally:
+        pool.close()
@@ -0,0 +1,271 @@
+"""
+Size-capped local cache of downloaded sources, so a re-encode skips the network.
+
+Converting a video that was converted before normally means downloading
+the same source again, for example mp3 at 320 and then at 192. With the
+cache on, every fetched source is kept under the cache directory, keyed by
+video ID and the yt-dlp format ID that was selected. A later conversion of
+the same video links the cached file into its workspace instead of
+downloading it. Files are stored once per content hash (sha256), so two keys
+that resolve to identical bytes share one file. The cache holds at most
+``max_bytes``; past that, the least recently used entries are evicted.
+
+The cache is off until ``configure`` is given a directory (the CLI's
+``--source-cache``, or the ``SMUGGY_SOURCE_CACHE_DIR`` environment variable).
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import SOURCE_CACHE_DIR_ENV, SOURCE_CACHE_INDEX_FILE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_CHUNK_SIZE = 1024 * 1024
+BLOBS_DIR = "blobs"
+
+
+def _link_or_copy(src, dst, digest=None):
+    """Hard-link ``src`` to ``dst``, or copy it when linking isn't possible.
+
+    With ``digest`` (a hashlib object), the bytes are fed to it in the same
+    pass: read while copying, or read once after a link.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem, or one without hard links
+        with open(src, "rb") as reader, open(dst, "wb") as writer:
+            for chunk in iter(lambda: reader.read(HASH_CHUNK_SIZE), b""):
+                if digest is not None:
+                    digest.update(chunk)
+                writer.write(chunk)
+        return
+    if digest is not None:
+        with open(src, "rb") as reader:
+            for chunk in iter(lambda: reader.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+
+class SourceCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def enabled(self):
+        return self.root is not None and self.max_bytes > 0
+
+    def configure(self, root, max_bytes=None):
+        """Cache sources under ``root`` (None turns the cache off), keeping at most ``max_bytes``."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.root = Path(root) if root else None
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+        if self.enabled:
+            self._evict()
+
+    def _connect(self):
+        if self._conn is None:
+            (self.root / BLOBS_DIR).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.root / SOURCE_CACHE_INDEX_FILE), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                " video_id TEXT NOT NULL,"
+                " format_id TEXT NOT NULL,"
+                " fmt TEXT NOT NULL,"
+                " title TEXT,"
+                " ext TEXT NOT NULL,"
+                " sha256 TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " quality INTEGER,"
+                " max_height INTEGER,"
+                " PRIMARY KEY (video_id, format_id))"
+            )
+            # Indexes written before the target columns existed
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sources)")}
+            for column in ("quality", "max_height"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE sources ADD COLUMN {column} INTEGER")
+            self._conn.commit()
+        return self._conn
+
+    def _blob_path(self, sha256):
+        return self.root / BLOBS_DIR / sha256[:2] / sha256
+
+    def lookup(self, video_id, format_id=None, accept=None):
+        """The cached source for ``video_id``, or None.
+
+        An entry with ``format_id`` matches. So does any entry for which
+        ``accept(entry)`` is true, e.g. one fetched for a target at least as
+        demanding as this one; an exact ``format_id`` match wins, then the
+        most recently used. With neither given, any entry for the video
+        matches. The entry is a dict with ``format_id``, ``fmt``,
+        ``quality`` and ``max_height`` (the target it was fetched for),
+        ``title``, ``ext``, ``sha256``, ``size`` and ``path``; it counts as used.
+        """
+        if not self.enabled or not video_id:
+            return None
+        entry = None
+        with self._lock:
+            try:
+                conn = self._connect()
+                rows = conn.execute(
+                    "SELECT format_id, fmt, quality, max_height, title, ext, sha256, size FROM sources WHERE video_id = ?"
+                    " ORDER BY format_id = ? DESC, last_used DESC",
+                    (video_id, format_id or ""),
+                ).fetchall()
+                for row in rows:
+                    candidate = dict(zip(("format_id", "fmt", "quality", "max_height", "title", "ext", "sha256", "size"), row))
+                    if format_id or accept:
+                        if candidate["format_id"] != format_id and not (accept and accept(candidate)):
+                            continue
+                    path = self._blob_path(candidate["sha256"])
+                    if not path.is_file() or path.stat().st_size != candidate["size"]:
+                        # Removed or truncated behind our back
+                        self._delete(conn, video_id, candidate["format_id"])
+                        conn.commit()
+                        continue
+                    entry = {**candidate, "path": str(path)}
+                    break
+                if entry is None:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE sources SET last_used = ? WHERE video_id = ? AND format_id = ?", (time.time(), video_id, entry["format_id"]),
+                )
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Source cache read failed", extra={"video_id": video_id, "error": str(e)})
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry
+
+    def materialize(self, entry, dest):
+        """Put the cached file for ``entry`` at ``dest`` (a hard link when possible); returns ``dest``."""
+        _link_or_copy(entry["path"], dest)
+        return dest
+
+    def put(self, video_id, format_id, fmt, title, path, quality=None, max_height=None):
+        """Add the source at ``path`` for ``video_id``/``format_id``, fetched for ``fmt`` at ``quality`` under ``max_height``.
+
+        The file is hashed in the same pass that links or copies it into the
+        cache, and ``path`` is left in place. Sources larger than the whole
+        budget are not kept. Returns the sha256, or None if nothing was stored.
+        """
+        if not self.enabled or not video_id or not format_id:
+            return None
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        if size > self.max_bytes:
+            logger.info("Source too large for the cache", extra={"video_id": video_id, "bytes": size})
+            return None
+        try:
+            (self.root / BLOBS_DIR).mkdir(parents=True, exist_ok=True)
+            partial = self.root / BLOBS_DIR / f".{uuid.uuid4().hex}.partial"
+            digest = hashlib.sha256()
+            try:
+                _link_or_copy(path, partial, digest)
+                sha256 = digest.hexdigest()
+                blob = self._blob_path(sha256)
+                blob.parent.mkdir(exist_ok=True)
+                # Identical bytes already cached under another key: keep one copy
+                if blob.is_file():
+                    os.remove(partial)
+                else:
+                    os.replace(partial, blob)
+            except BaseException:
+                try:
+                    os.remove(partial)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.error("Source cache write failed", extra={"video_id": video_id, "error": str(e)})
+            return None
+        now = time.time()
+        ext = os.path.splitext(path)[1].lstrip(".")
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources"
+                    " (video_id, format_id, fmt, title, ext, sha256, size, stored_at, last_used, quality, max_height)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (video_id, format_id, fmt, title, ext, sha256, size, now, now, quality, max_height),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error("Source cache write failed", extra={"video_id": video_id, "error": str(e)})
+                return None
+        self._evict()
+        return sha256
+
+    def _delete(self, conn, video_id, format_id):
+        """Drop one entry, and its file once no other entry shares it; the caller commits."""
+        row = conn.execute("SELECT sha256 FROM sources WHERE video_id = ? AND format_id = ?", (video_id, format_id)).fetchone()
+        conn.execute("DELETE FROM sources WHERE video_id = ? AND format_id = ?", (video_id, format_id))
+        if row and not conn.execute("SELECT 1 FROM sources WHERE sha256 = ? LIMIT 1", (row[0],)).fetchone():
+            try:
+                os.remove(self._blob_path(row[0]))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Evict least-recently-used entries until the files fit in ``max_bytes``."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                # Shared files count once
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM sources)").fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                for video_id, format_id in conn.execute("SELECT video_id, format_id FROM sources ORDER BY last_used").fetchall():
+                    self._delete(conn, video_id, format_id)
+                    self.evictions += 1
+                    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM sources)").fetchone()[0]
+                    if total <= self.max_bytes:
+                        break
+                conn.commit()
+                logger.info("Source cache evicted", extra={"bytes": total, "max_bytes": self.max_bytes})
+            except sqlite3.Error as e:
+                logger.error("Source cache eviction failed", extra={"error": str(e)})
+
+    def clear(self):
+        """Remove every cached source."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self.root is not None:
+                shutil.rmtree(self.root / BLOBS_DIR, ignore_errors=True)
+                try:
+                    os.remove(self.root / SOURCE_CACHE_INDEX_FILE)
+                except OSError:
+                    pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+source_cache = SourceCache(os.environ.get(SOURCE_CACHE_DIR_ENV) or None)
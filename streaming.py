@@ -0,0 +1,129 @@
+"""
+Zero-temp-file conversion: feed the media stream into ffmpeg's stdin as it arrives.
+
+Only single-stream sources over plain HTTP in containers ffmpeg can demux
+without seeking are streamed; everything else keeps the temp-file path.
+"""
+import logging
+import queue
+import threading
+import time
+
+from process_runner import StderrTail, kill_on_cancel
+
+logger = logging.getLogger(__name__)
+
+# Containers ffmpeg can read front-to-back from a pipe (mp4/m4a may keep the moov atom at the end)
+STREAMABLE_EXTS = ("webm", "weba", "mka", "mkv", "ogg", "opus", "mp3", "aac", "flac", "wav")
+STREAMABLE_PROTOCOLS = ("http", "https")
+CHUNK_SIZE = 64 * 1024
+# 64 x 64 KiB = at most 4 MiB held between the network and ffmpeg
+DEFAULT_BUFFER_CHUNKS = 64
+READ_TIMEOUT = 30
+
+_EOF = object()
+
+
+class StreamError(Exception):
+    pass
+
+
+def is_streamable(selected):
+    """True if the format yt-dlp selected can be piped straight into ffmpeg."""
+    if selected.get("requested_formats"):
+        return False
+    return (
+        selected.get("protocol") in STREAMABLE_PROTOCOLS
+        and selected.get("ext") in STREAMABLE_EXTS
+        and bool(selected.get("url"))
+    )
+
+
+def stream_into_ffmpeg(media_url, headers, output, buffer_chunks=DEFAULT_BUFFER_CHUNKS, on_progress=None, token=None):
+    """Download ``media_url`` into the stdin of ``output``, an ffmpeg-python graph built on ``ffmpeg.input("pipe:")``.
+
+    A reader thread fills a bounded chunk queue and a feeder thread drains it
+    into ffmpeg, so a slow encoder stalls the download instead of growing memory.
+    ``on_progress`` receives download events as chunks arrive. Returns the
+    number of bytes streamed; raises StreamError on network or ffmpeg failure.
+    Cancelling ``token`` kills ffmpeg, stops the download and raises Cancelled
+    (or StageTimeout).
+    """
+    chunks = queue.Queue(maxsize=max(1, buffer_chunks))
+    errors = []
+    stop = threading.Event()
+    streamed = 0
+
+    process = output.run_async(pipe_stdin=True, pipe_stderr=True, overwrite_output=True)
+
+    def _read():
+        nonlocal streamed
+        # Imported here: urllib.request is slow to load and only needed once a stream starts
+        import urllib.request
+
+        try:
+            request = urllib.request.Request(media_url, headers=headers or {})
+            with urllib.request.urlopen(request, timeout=READ_TIMEOUT) as response:
+                total = response.length
+                started = time.monotonic()
+                while not stop.is_set():
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    streamed += len(chunk)
+                    chunks.put(chunk)
+                    if on_progress:
+                        elapsed = time.monotonic() - started
+                        on_progress({
+                            "stage": "download",
+                            "status": "downloading",
+                            "downloaded_bytes": streamed,
+                            "total_bytes": total,
+                            "speed": streamed / elapsed if elapsed else None,
+                        })
+        except Exception as e:
+            errors.append(e)
+        finally:
+            chunks.put(_EOF)
+
+    def _feed():
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _EOF:
+                    break
+                process.stdin.write(chunk)
+        except (BrokenPipeError, OSError) as e:
+            # ffmpeg exited early; its stderr says why
+            stop.set()
+            errors.append(e)
+            # Unblock the reader if it is waiting on a full queue
+            while chunks.get() is not _EOF:
+                pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    reader = threading.Thread(target=_read, name="stream-read", daemon=True)
+    feeder = threading.Thread(target=_feed, name="stream-feed", daemon=True)
+    stderr = StderrTail()
+    drain = stderr.drain(process.stderr)
+    with kill_on_cancel(process, token):
+        reader.start()
+        feeder.start()
+        returncode = process.wait()
+        reader.join()
+        feeder.join()
+        drain.join()
+
+    if token:
+        token.raise_if_cancelled()
+    if returncode != 0:
+        raise StreamError(f"ffmpeg error: {stderr.getvalue().decode('utf-8', errors='ignore')}")
+    if errors:
+        raise StreamError(f"stream error: {errors[0]}")
+    logger.info("Streamed into ffmpeg", extra={"bytes": streamed})
+    return streamed
+
@@ -0,0 +1,94 @@
+"""
+Admission control for ffmpeg processes.
+
+Every encode asks for a slot before starting ffmpeg. Slots are weighted by
+job kind and drawn from a budget of ``os.cpu_count()`` units, and the weight
+is also the ``-threads`` value handed to ffmpeg. Light mp3 jobs can then run
+side by side while a heavy x264 encode takes a larger share, and the cores
+are never oversubscribed. Waiters are admitted in arrival order so a big
+mp4 job can't be starved by a stream of small ones.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class TranscodeSlot:
+    def __init__(self, kind, threads, wait_time):
+        self.kind = kind
+        self.threads = threads
+        self.wait_time = wait_time
+        self.encode_time = None
+
+
+class TranscodeScheduler:
+    def __init__(self, cpu_budget=None, weights=None):
+        self.capacity = max(1, cpu_budget or os.cpu_count() or 1)
+        # libmp3lame and stream copies are effectively single-threaded;
+        # x264 scales, so it gets half the machine
+        self.weights = {"mp3": 1, "remux": 1, "mp4": max(1, self.capacity // 2)}
+        if weights:
+            self.weights.update(weights)
+        self._in_use = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+        self._stats = {}
+
+    def _weight(self, kind):
+        return min(self.capacity, max(1, self.weights.get(kind, 1)))
+
+    def combined_weight(self, kinds):
+        """Weight of one ffmpeg run that encodes an output of each of ``kinds`` at once."""
+        return min(self.capacity, sum(self._weight(kind) for kind in kinds))
+
+    @contextmanager
+    def slot(self, kind, weight=None):
+        """Block until ``kind`` fits in the CPU budget; yields a TranscodeSlot whose ``threads`` to pass to ffmpeg.
+
+        ``weight`` overrides the kind's weight (see ``combined_weight``).
+        """
+        weight = self._weight(kind) if weight is None else min(self.capacity, max(1, weight))
+        ticket = object()
+        queued_at = time.monotonic()
+        with self._cond:
+            self._waiters.append(ticket)
+            while self._waiters[0] is not ticket or self._in_use + weight > self.capacity:
+                self._cond.wait()
+            self._waiters.popleft()
+            self._in_use += weight
+            # The next waiter may fit as well
+            self._cond.notify_all()
+        slot = TranscodeSlot(kind, weight, time.monotonic() - queued_at)
+        started = time.monotonic()
+        try:
+            yield slot
+        finally:
+            slot.encode_time = time.monotonic() - started
+            with self._cond:
+                self._in_use -= weight
+                self._record(slot)
+                self._cond.notify_all()
+            logger.info(
+                "Transcode finished",
+                extra={"kind": kind, "threads": weight, "wait_s": round(slot.wait_time, 3), "encode_s": round(slot.encode_time, 3)},
+            )
+
+    def _record(self, slot):
+        entry = self._stats.setdefault(slot.kind, {"jobs": 0, "wait_s": 0.0, "encode_s": 0.0, "max_wait_s": 0.0})
+        entry["jobs"] += 1
+        entry["wait_s"] += slot.wait_time
+        entry["encode_s"] += slot.encode_time
+        entry["max_wait_s"] = max(entry["max_wait_s"], slot.wait_time)
+
+    def stats(self):
+        """Per-kind totals of queue wait and encode time since startup."""
+        with self._cond:
+            return {kind: dict(entry) for kind, entry in self._stats.items()}
+
+
+scheduler = TranscodeScheduler()
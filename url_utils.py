@@ -0,0 +1,40 @@
+import re
+from urllib.parse import parse_qs, urlparse
+
+YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com", "www.youtube-nocookie.com")
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_PATH_PREFIXES = ("shorts", "embed", "live", "v", "e")
+
+
+def _valid_id(candidate):
+    return candidate if candidate and _VIDEO_ID_RE.match(candidate) else None
+
+
+def extract_video_id(url):
+    """Return the YouTube video ID in ``url`` without any network access, or None."""
+    if not url:
+        return None
+    url = url.strip()
+    if _VIDEO_ID_RE.match(url):
+        return url
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    parts = [p for p in parsed.path.split("/") if p]
+    if host in ("youtu.be", "www.youtu.be"):
+        return _valid_id(parts[0]) if parts else None
+    if host in YOUTUBE_HOSTS:
+        if parts and parts[0] == "watch":
+            return _valid_id(parse_qs(parsed.query).get("v", [None])[0])
+        if len(parts) >= 2 and parts[0] in _PATH_PREFIXES:
+            return _valid_id(parts[1])
+    return None
+
+
+def normalize_video_url(url):
+    """Canonical watch URL for YouTube links (youtu.be, /shorts/, &list=... variants); other URLs are returned stripped."""
+    video_id = extract_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return url.strip()
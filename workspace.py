@@ -0,0 +1,108 @@
+"""
+Per-item scratch directories and atomic publishing into the output folder.
+
+Every download gets its own directory under the scratch root. The source
+file, any segments, and the encoded output all live there until the item is
+done. Two items with the same title can't clash, and the library never
+shows a half-written file. The scratch root can point at a fast local disk
+or a tmpfs. It is set with ``set_scratch_root``, the ``SMUGGY_SCRATCH_DIR``
+environment variable, or left as the system temp dir. Slow targets such as
+network shares then see one final copy and nothing else.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import SCRATCH_DIR_ENV, SCRATCH_DIR_NAME
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_PREFIX = "item-"
+PARTIAL_SUFFIX = ".partial"
+# Workspaces this old were left behind by a crashed run
+STALE_AFTER_S = 24 * 3600
+
+_scratch_root = None
+_lock = threading.Lock()
+_purged = False
+
+
+def set_scratch_root(path):
+    """Use ``path`` for scratch space from now on (None restores the default)."""
+    global _scratch_root
+    with _lock:
+        _scratch_root = Path(path) if path else None
+
+
+def scratch_root():
+    with _lock:
+        configured = _scratch_root
+    root = configured or Path(os.environ.get(SCRATCH_DIR_ENV) or Path(tempfile.gettempdir()) / SCRATCH_DIR_NAME)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def purge_stale_workspaces(max_age=STALE_AFTER_S):
+    """Remove workspaces older than ``max_age`` seconds, left behind by crashed runs."""
+    cutoff = time.time() - max_age
+    for path in scratch_root().glob(f"{WORKSPACE_PREFIX}*"):
+        try:
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info("Removed stale workspace", extra={"path": str(path)})
+        except OSError:
+            pass
+
+
+class Workspace:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @classmethod
+    def create(cls):
+        """A new, empty scratch directory for one item."""
+        global _purged
+        if not _purged:
+            _purged = True
+            purge_stale_workspaces()
+        return cls(tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=scratch_root()))
+
+    def file(self, name):
+        """Path of ``name`` inside the workspace, as a string."""
+        return str(self.path / name)
+
+    def publish(self, path, dest_dir, filename):
+        """Move ``path`` to ``dest_dir/filename`` atomically; returns the final path.
+
+        A rename when both are on one filesystem. Otherwise the file is copied
+        next to the destination under a temporary name, then renamed over it,
+        so readers see either the old file or the complete new one.
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+        final_path = os.path.join(dest_dir, filename)
+        try:
+            os.replace(path, final_path)
+            return final_path
+        except OSError:
+            # Different filesystem (scratch on tmpfs, output on a share, ...)
+            pass
+        partial = os.path.join(dest_dir, f".{filename}.{uuid.uuid4().hex[:8]}{PARTIAL_SUFFIX}")
+        try:
+            shutil.copyfile(path, partial)
+            os.replace(partial, final_path)
+        except BaseException:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
+        os.remove(path)
+        return final_path
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)